@@ -1,10 +1,18 @@
 import os
+import re
+import copy
 import json
+import hashlib
+from collections import OrderedDict
+from functools import cached_property, lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 import google.generativeai as genai
+import ijson
+import orjson
+import numpy as np
 import pandas as pd
-from src.resilience import calculate_resilience 
+from src.resilience import calculate_resilience_batch
 
 env_path = Path(__file__).resolve().parent.parent / ".env"
 load_dotenv(env_path)
@@ -16,210 +24,249 @@ if not API_KEY:
 genai.configure(api_key=API_KEY)
 model = genai.GenerativeModel("gemini-2.5-pro")
 
-class ReportAI:
-    """IA pour générer des rapports opérationnels tactiques pour les services de secours"""
+# Cache des réponses Gemini (clé = sha256 du prompt)
+LLM_CACHE_DIR = Path(__file__).resolve().parent.parent / "data" / ".llm_cache"
+LLM_CACHE_SIZE = 128
+_llm_cache = OrderedDict()
+
+
+def _get_cached_advice(key: str, disk: bool = True):
+    """Récupère une copie d'une réponse Gemini en cache (mémoire puis disque si disk=True)"""
+    if key in _llm_cache:
+        _llm_cache.move_to_end(key)
+        # Copie: un appelant qui modifie le rapport ne doit pas altérer le cache
+        return copy.deepcopy(_llm_cache[key])
     
-    def __init__(self):
-        self.base_path = Path(__file__).resolve().parent.parent
-        self.region_names = self._load_region_names()
-        self.resilience_data = self._load_resilience_data()
-        self._add_region_names_to_data()
-        self.hazard_zones = self._load_hazard_zones()
-        self.alerts = self._load_alerts()
+    if not disk:
+        return None
     
-    def _load_resilience_data(self) -> pd.DataFrame:
-        """Charge et prépare les données de résilience"""
-        csv_path = self.base_path / "data" / "resilience_scores.csv"
-        if not csv_path.exists():
-            raise FileNotFoundError(f"Fichier manquant: {csv_path}")
-        
-        df = pd.read_csv(csv_path)
-        
-        # Calculer l'indice de résilience
-        df["resilience_index"] = df.apply(
-            lambda row: calculate_resilience(
-                row["exposure"],
-                row["vulnerability"],
-                row["adaptation"]
-            ),
-            axis=1
-        )
+    cache_file = LLM_CACHE_DIR / f"{key}.json"
+    if cache_file.exists():
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                advice = json.load(f)
+        except Exception as e:
+            print(f"Erreur lecture cache IA: {e}")
+            return None
+        _store_cached_advice(key, advice, persist=False)
+        return advice
+    
+    return None
 
-        
-        # Ajouter catégorie de résilience
-        df["resilience_category"] = df["resilience_index"].apply(self._categorize_resilience)
-        
-        return df
+
+def _store_cached_advice(key: str, advice: dict, persist: bool = True):
+    """Stocke une copie d'une réponse Gemini en cache (mémoire LRU + disque)"""
+    _llm_cache[key] = copy.deepcopy(advice)
+    _llm_cache.move_to_end(key)
+    if len(_llm_cache) > LLM_CACHE_SIZE:
+        _llm_cache.popitem(last=False)
     
-    def _add_region_names_to_data(self):
-        """Ajoute les noms de régions au DataFrame après chargement"""
-        if "region_name" not in self.resilience_data.columns:
-            self.resilience_data["region_name"] = self.resilience_data["region_id"].map(
-                lambda rid: self.region_names.get(rid, rid)
-            )
+    if persist:
+        try:
+            LLM_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(LLM_CACHE_DIR / f"{key}.json", "w", encoding="utf-8") as f:
+                json.dump(advice, f, ensure_ascii=False)
+            _prune_disk_cache()
+        except Exception as e:
+            print(f"Erreur écriture cache IA: {e}")
+
+
+def _prune_disk_cache():
+    """Garde au plus LLM_CACHE_SIZE fichiers sur disque (supprime les plus anciens)"""
+    files = list(LLM_CACHE_DIR.glob("*.json"))
+    if len(files) <= LLM_CACHE_SIZE:
+        return
+    files.sort(key=lambda p: p.stat().st_mtime)
+    for old_file in files[:len(files) - LLM_CACHE_SIZE]:
+        old_file.unlink(missing_ok=True)
+
+
+# Données partagées entre toutes les instances (chargées une fois par processus)
+BASE_PATH = Path(__file__).resolve().parent.parent
+
+
+def _context_summary(context: dict, scope: str) -> str:
+    """
+    Résumé compact des faits clés du contexte (clé de cache "sémantique").
     
-    def _load_region_names(self) -> dict:
-        """Charge les noms corrects des régions depuis le GeoJSON"""
-        geojson_path = self.base_path / "data" / "mock" / "regions.geojson"
-        region_names = {}
-        
-        default_names = {
-            "MUAG": "North Islands",
-            "MUBL": "Black River",
-            "MUCC": "Saint Brandon Islands",
-            "MUFL": "Flacq",
-            "MUGP": "Grand Port",
-            "MUMO": "Moka",
-            "MUPA": "Pamplemousses",
-            "MUPL": "Port Louis",
-            "MUPW": "Plaines Wilhems",
-            "MURO": "Rodriguez Island",
-            "MURR": "Riviere du Rempart",
-            "MUSA": "Savanne"
-        }
+    Insensible au bruit flottant: deux contextes qui ne diffèrent que par
+    l'arrondi des scores partagent la même réponse.
+    """
+    alert_types = [a.get("type") for a in context["active_alerts"]]
+    facts = [
+        scope,
+        f"avg={round(context['avg_resilience'])}",
+        "critical=" + ",".join(z["name"] for z in context["critical_zones"]),
+        "categories=" + ",".join(f"{r['id']}:{r['category']}" for r in context["regions"]),
+        f"alerts={alert_types.count('danger')}/{alert_types.count('safe')}",
+        f"hazards={context['hazard_zones']}"
+    ]
+    return "|".join(facts)
 
-        
-        if geojson_path.exists():
-            try:
-                with open(geojson_path, "r", encoding="utf-8") as f:
-                    geojson = json.load(f)
-                    for feature in geojson.get("features", []):
-                        props = feature.get("properties", {})
-                        region_id = props.get("region_id")
-                        region_name = props.get("region_name")
-                        if region_id and region_name:
-                            region_names[region_id] = region_name
-            except Exception as e:
-                print(f"Erreur chargement GeoJSON: {e}")
-        
-        return {**default_names, **region_names}
+
+# Catégories de résilience du rapport: <40, 40-60, 60-80, >=80
+RESILIENCE_CATEGORY_BOUNDS = np.array([40, 60, 80])
+RESILIENCE_CATEGORY_LABELS = ["CRITIQUE", "FAIBLE", "MODÉRÉ", "ÉLEVÉ"]
+
+DEFAULT_REGION_NAMES = {
+    "MUAG": "North Islands",
+    "MUBL": "Black River",
+    "MUCC": "Saint Brandon Islands",
+    "MUFL": "Flacq",
+    "MUGP": "Grand Port",
+    "MUMO": "Moka",
+    "MUPA": "Pamplemousses",
+    "MUPL": "Port Louis",
+    "MUPW": "Plaines Wilhems",
+    "MURO": "Rodriguez Island",
+    "MURR": "Riviere du Rempart",
+    "MUSA": "Savanne"
+}
+
+
+@lru_cache(maxsize=1)
+def _load_region_names_cached() -> dict:
+    """Charge les noms corrects des régions depuis le GeoJSON"""
+    geojson_path = BASE_PATH / "data" / "mock" / "regions.geojson"
+    region_names = dict(DEFAULT_REGION_NAMES)
     
-    def _load_hazard_zones(self) -> dict:
-        """Charge les zones de risque depuis GeoJSON"""
-        geojson_path = self.base_path / "data" / "mock" / "hasard_zone.geojson"
-        if geojson_path.exists():
+    if geojson_path.exists():
+        try:
             with open(geojson_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {"type": "FeatureCollection", "features": []}
+                geojson = json.load(f)
+                for feature in geojson.get("features", []):
+                    props = feature.get("properties", {})
+                    region_id = props.get("region_id")
+                    region_name = props.get("region_name")
+                    if region_id and region_name:
+                        region_names[region_id] = region_name
+        except Exception as e:
+            print(f"Erreur chargement GeoJSON: {e}")
     
-    def _load_alerts(self) -> list:
-        """Charge les alertes actuelles"""
-        alerts_path = self.base_path / "data" / "alerts.json"
-        if alerts_path.exists():
-            with open(alerts_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return []
+    return region_names
+
+
+@lru_cache(maxsize=1)
+def _load_resilience_df_cached() -> pd.DataFrame:
+    """Charge et prépare les données de résilience"""
+    csv_path = BASE_PATH / "data" / "resilience_scores.csv"
+    if not csv_path.exists():
+        raise FileNotFoundError(f"Fichier manquant: {csv_path}")
     
-    def _categorize_resilience(self, score):
-        """Catégorise le score de résilience"""
-        if score < 40:
-            return "CRITIQUE"
-        elif score < 60:
-            return "FAIBLE"
-        elif score < 80:
-            return "MODÉRÉ"
-        else:
-            return "ÉLEVÉ"
+    # Cache Parquet du CSV brut uniquement : les colonnes calculées dépendent du code
+    # (poids, seuils, règles de risque, noms) et sont recalculées à chaque chargement
+    parquet_path = csv_path.with_suffix(".report.parquet")
+    df = None
+    if parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+        try:
+            df = pd.read_parquet(parquet_path)
+        except Exception as e:
+            print(f"Erreur lecture cache Parquet: {e}")
     
-    def _get_region_name(self, region_id: str) -> str:
-        """Récupère le nom correct de la région"""
-        return self.region_names.get(region_id, region_id)
+    if df is None:
+        df = pd.read_csv(
+            csv_path,
+            engine="pyarrow",
+            dtype={
+                "region_id": "string",
+                "exposure": "float64",
+                "vulnerability": "float64",
+                "adaptation": "float64"
+            }
+        )
+        try:
+            df.to_parquet(parquet_path, index=False)
+        except Exception as e:
+            print(f"Erreur écriture cache Parquet: {e}")
     
-    def generate_security_advice(self, region_id: str = None) -> dict:
-        """
-        Génère un rapport opérationnel tactique pour une région ou toutes les régions.
-        """
-        if region_id:
-            data = self.resilience_data[self.resilience_data.get("region_id") == region_id]
-            if data.empty:
-                return {"error": f"Région {region_id} non trouvée"}
-        else:
-            data = self.resilience_data
-        
-        context = self._prepare_context(data)
-        advice = self._call_gemini(context, region_id)
-        
-        return advice
+    # Calculer l'indice de résilience (vectorisé)
+    df = calculate_resilience_batch(df)
     
-    def _prepare_context(self, data):
-        """Prépare les données pour le prompt"""
-        context = {
-            "regions": [],
-            "critical_zones": [],
-            "adaptation_gaps": [],
-            "active_alerts": self.alerts,
-            "hazard_zones": len(self.hazard_zones.get("features", [])),
-            "total_regions": len(data),
-            "avg_resilience": float(data["resilience_index"].mean())
-        }
-        
-        for _, row in data.iterrows():
-            region_id = row.get("region_id", "N/A")
-            region_name = self._get_region_name(region_id)
-            
-            region_info = {
-                "id": region_id,
-                "name": region_name,
-                "resilience_index": float(row.get("resilience_index", 0)),
-                "category": row.get("resilience_category", "INCONNU"),
-                "exposure": float(row.get("exposure", 0)),
-                "vulnerability": float(row.get("vulnerability", 0)),
-                "adaptation": float(row.get("adaptation", 0))
-            }
-            context["regions"].append(region_info)
-            
-            # Zones critiques (résilience < 40)
-            if region_info["resilience_index"] < 40:
-                context["critical_zones"].append({
-                    "name": region_name,
-                    "score": region_info["resilience_index"],
-                    "main_risk": self._identify_main_risk(row)
-                })
-            
-            # Gaps d'adaptation (adaptation < 50)
-            if region_info["adaptation"] < 50:
-                context["adaptation_gaps"].append({
-                    "region": region_name,
-                    "adaptation_score": region_info["adaptation"],
-                    "exposure": region_info["exposure"],
-                    "vulnerability": region_info["vulnerability"]
-                })
-        
-        # Trier par priorité
-        context["regions"].sort(key=lambda x: x["resilience_index"])
-        context["critical_zones"].sort(key=lambda x: x["score"])
-        
-        return context
+    # Ajouter catégorie de résilience
+    codes = np.searchsorted(
+        RESILIENCE_CATEGORY_BOUNDS, df["resilience_index"].to_numpy(), side="right"
+    )
+    df["resilience_category"] = pd.Categorical.from_codes(
+        codes, categories=RESILIENCE_CATEGORY_LABELS, ordered=True
+    )
     
-    def _identify_main_risk(self, row):
-        """Identifie le risque principal"""
-        exposure = float(row.get("exposure", 0))
-        vulnerability = float(row.get("vulnerability", 0))
-        adaptation = float(row.get("adaptation", 0))
-        
-        if exposure > 80 and vulnerability > 60:
-            return "Exposition critique + Infrastructure fragile → Intervention prioritaire"
-        elif exposure > 80:
-            return "Exposition très élevée → Risque cyclones/inondations majeur"
-        elif vulnerability > 70:
-            return "Infrastructure défaillante → Renforcement défensif urgent"
-        elif adaptation < 40:
-            return "Capacité d'adaptation insuffisante → Formation/équipement requis"
-        else:
-            return "Risque modéré → Surveillance continue"
+    # Risque principal (vectorisé)
+    df["main_risk"] = _identify_main_risk(df)
     
-    def _call_gemini(self, context, region_id=None):
-        """Appelle Gemini pour générer le rapport opérationnel"""
-        
-        if region_id and context['regions']:
-            scope = f"Région: {context['regions'][0]['name']}"
-        else:
-            scope = "Île Maurice - Analyse globale"
-        
-        prompt = f"""Tu es un analyste stratégique en gestion de crise pour les services de secours mauriciens.
+    # Ajouter les noms de régions si absents
+    if "region_name" not in df.columns:
+        region_names = _load_region_names_cached()
+        df["region_name"] = df["region_id"].map(lambda rid: region_names.get(rid, rid))
+    
+    return df
+
+
+@lru_cache(maxsize=1)
+def _load_hazard_zone_count_cached() -> int:
+    """Compte les zones de risque du GeoJSON (seul le nombre est utilisé)"""
+    geojson_path = BASE_PATH / "data" / "mock" / "hasard_zone.geojson"
+    if geojson_path.exists():
+        # Lecture en flux par événements: aucune feature (ni géométrie) n'est construite
+        with open(geojson_path, "rb") as f:
+            return sum(
+                1 for prefix, event, _ in ijson.parse(f)
+                if event == "start_map" and prefix == "features.item"
+            )
+    return 0
+
+
+@lru_cache(maxsize=1)
+def _load_alerts_cached(mtime: float) -> list:
+    """Charge les alertes actuelles (relues seulement si le fichier change)"""
+    alerts_path = BASE_PATH / "data" / "alerts.jsonl"
+    with open(alerts_path, "rb") as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+
+def _load_alerts() -> list:
+    """Charge les alertes actuelles"""
+    alerts_path = BASE_PATH / "data" / "alerts.jsonl"
+    if alerts_path.exists():
+        return _load_alerts_cached(alerts_path.stat().st_mtime)
+    return []
+
+
+def _identify_main_risk(df):
+    """Identifie le risque principal de chaque région"""
+    exposure = df["exposure"].to_numpy()
+    vulnerability = df["vulnerability"].to_numpy()
+    adaptation = df["adaptation"].to_numpy()
+    
+    conditions = [
+        (exposure > 80) & (vulnerability > 60),
+        exposure > 80,
+        vulnerability > 70,
+        adaptation < 40
+    ]
+    choices = [
+        "Exposition critique + Infrastructure fragile → Intervention prioritaire",
+        "Exposition très élevée → Risque cyclones/inondations majeur",
+        "Infrastructure défaillante → Renforcement défensif urgent",
+        "Capacité d'adaptation insuffisante → Formation/équipement requis"
+    ]
+    
+    return np.select(conditions, choices, default="Risque modéré → Surveillance continue")
+
+
+# Bloc ```json ... ``` éventuellement renvoyé par Gemini (refermé ou non)
+FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL)
+
+
+def _strip_fence(text: str) -> str:
+    """Retire le markdown autour du JSON si présent"""
+    match = FENCE_RE.search(text)
+    return match.group(1).strip() if match else text.strip()
+
+# Prompt du rapport opérationnel (placeholders: ctx_json, scope)
+PROMPT_TEMPLATE = """Tu es un analyste stratégique en gestion de crise pour les services de secours mauriciens.
 
 DONNÉES TERRAIN:
-{json.dumps(context, indent=2, ensure_ascii=False)}
+{ctx_json}
 
 Génère un RAPPORT OPÉRATIONNEL TACTIQUE pour: {scope}
 
@@ -261,19 +308,159 @@ DIRECTIVES:
 - Utiliser les noms de régions EXACTS du contexte
 - Focaliser sur l'actionable (pas de généralités)"""
 
+
+def _format_region_advice(r) -> dict:
+    """Conseil de secours pour une région (ligne de itertuples)"""
+    return {
+        "region": r.name,
+        "resilience_score": r.resilience_index,
+        "key_vulnerabilities": [
+            f"Exposition: {r.exposure:.0f}/100 - Risque environnemental élevé",
+            f"Vulnérabilité: {r.vulnerability:.0f}/100 - Infrastructure fragile",
+            f"Adaptation: {r.adaptation:.0f}/100 - Capacité de réponse limitée"
+        ],
+        "immediate_actions": [
+            "Pré-positionnement équipes de sauvetage en stand-by",
+            "Activation protocole d'évacuation préventive si dégradation",
+            "Sécurisation itinéraires d'accès pour moyens lourds",
+            "Mise en place cellule de commandement avancée"
+        ],
+        "resource_needs": [
+            f"Équipes USAR (Urban Search And Rescue) - {r.usar_units} unités",
+            f"Moyens héliportés - {r.helicopters} hélicoptère(s)",
+            f"Ambulances SMUR - {r.ambulances} véhicules",
+            "Kit d'intervention en milieu hostile"
+        ]
+    }
+
+
+class ReportAI:
+    """IA pour générer des rapports opérationnels tactiques pour les services de secours"""
+    
+    def __init__(self):
+        self.base_path = BASE_PATH
+        self.region_names = _load_region_names_cached()
+        self.resilience_data = _load_resilience_df_cached()
+        self.hazard_zone_count = _load_hazard_zone_count_cached()
+        self.alerts = _load_alerts()
+        self._region_index = {
+            rid: i for i, rid in enumerate(self.resilience_data["region_id"].to_numpy())
+        }
+        self._region_contexts = {}
+        
+        # Nom de région → region_id (première occurrence)
+        self.region_ids_by_name = (
+            self.resilience_data.drop_duplicates("region_name")
+            .set_index("region_name")["region_id"].to_dict()
+        )
+    
+    def _get_region_name(self, region_id: str) -> str:
+        """Récupère le nom correct de la région"""
+        return self.region_names.get(region_id, region_id)
+    
+    def generate_security_advice(self, region_id: str = None) -> dict:
+        """
+        Génère un rapport opérationnel tactique pour une région ou toutes les régions.
+        """
+        if region_id:
+            context = self._region_context(region_id)
+            if context is None:
+                return {"error": f"Région {region_id} non trouvée"}
+        else:
+            context = self._global_context
+        
+        advice = self._call_gemini(context, region_id)
+        
+        return advice
+    
+    @cached_property
+    def _global_context(self) -> dict:
+        """Contexte de l'analyse globale (calculé une seule fois)"""
+        return self._prepare_context(self.resilience_data)
+    
+    def _region_context(self, region_id: str):
+        """Contexte d'une région (mémorisé par region_id)"""
+        if region_id not in self._region_contexts:
+            i = self._region_index.get(region_id)
+            if i is None:
+                return None
+            self._region_contexts[region_id] = self._prepare_context(self.resilience_data.iloc[[i]])
+        return self._region_contexts[region_id]
+    
+    def _prepare_context(self, data):
+        """Prépare les données pour le prompt"""
+        numeric_cols = ["resilience_index", "exposure", "vulnerability", "adaptation"]
+        
+        df = data[["region_id", "resilience_category", "main_risk"] + numeric_cols].astype(
+            {col: float for col in numeric_cols}
+        )
+        df["name"] = df["region_id"].map(self.region_names).fillna(df["region_id"])
+        
+        # Trier par priorité
+        df = df.sort_values("resilience_index", kind="stable")
+        
+        regions = df.rename(
+            columns={"region_id": "id", "resilience_category": "category"}
+        )[["id", "name", "resilience_index", "category", "exposure", "vulnerability", "adaptation"]]
+        
+        # Zones critiques (résilience < 40)
+        critical_zones = df.loc[
+            df["resilience_index"] < 40, ["name", "resilience_index", "main_risk"]
+        ].rename(columns={"resilience_index": "score"})
+        
+        # Gaps d'adaptation (adaptation < 50), dans l'ordre d'origine
+        gaps = df[df["adaptation"] < 50].sort_index()
+        adaptation_gaps = gaps.rename(
+            columns={"name": "region", "adaptation": "adaptation_score"}
+        )[["region", "adaptation_score", "exposure", "vulnerability"]]
+        
+        return {
+            "regions": regions.to_dict("records"),
+            "critical_zones": critical_zones.to_dict("records"),
+            "adaptation_gaps": adaptation_gaps.to_dict("records"),
+            "active_alerts": self.alerts,
+            "hazard_zones": self.hazard_zone_count,
+            "total_regions": len(data),
+            "avg_resilience": float(data["resilience_index"].mean())
+        }
+    
+    def _call_gemini(self, context, region_id=None):
+        """Appelle Gemini pour générer le rapport opérationnel"""
+        
+        if region_id and context['regions']:
+            scope = f"Région: {context['regions'][0]['name']}"
+        else:
+            scope = "Île Maurice - Analyse globale"
+        
+        ctx_json = orjson.dumps(
+            context, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode("utf-8")
+        prompt = PROMPT_TEMPLATE.format(ctx_json=ctx_json, scope=scope)
+
+        cache_key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        summary_key = hashlib.sha256(_context_summary(context, scope).encode("utf-8")).hexdigest()
+        # La clé résumé n'est jamais écrite sur disque: pas de lecture disque pour elle
+        for key, disk in ((cache_key, True), (summary_key, False)):
+            cached = _get_cached_advice(key, disk=disk)
+            if cached is not None:
+                return cached
+        
         try:
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
+            # Réponse en flux: on s'arrête dès que le JSON est complet
+            response = model.generate_content(prompt, stream=True)
+            chunks = []
+            for chunk in response:
+                chunks.append(chunk.text)
+                response_text = _strip_fence("".join(chunks))
+                try:
+                    advice = orjson.loads(response_text)
+                except orjson.JSONDecodeError:
+                    continue
+                _store_cached_advice(cache_key, advice)
+                _store_cached_advice(summary_key, advice, persist=False)
+                return advice
             
-            # Nettoyer markdown si présent
-            if "```" in response_text:
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-                response_text = response_text.split("```")[0]
-            
-            advice = json.loads(response_text)
-            return advice
+            raise ValueError("Réponse JSON incomplète")
             
         except Exception as e:
             print(f"Erreur Gemini: {e}")
@@ -288,6 +475,15 @@ DIRECTIVES:
         
         severity = "CRITIQUE" if len(critical) >= 3 else "ÉLEVÉ" if len(critical) > 0 else "MODÉRÉ"
         
+        # Top zones critiques + 3 suivantes, ressources calculées en colonnes
+        advice_df = pd.DataFrame(
+            critical + high_risk[:3],
+            columns=["name", "resilience_index", "exposure", "vulnerability", "adaptation"]
+        )
+        advice_df["usar_units"] = np.maximum(1, (advice_df["vulnerability"] / 30).astype(int))
+        advice_df["helicopters"] = (advice_df["resilience_index"] < 35).astype(int)
+        advice_df["ambulances"] = np.maximum(2, (advice_df["exposure"] / 25).astype(int))
+        
         return {
             "scope": scope,
             "executive_summary": f"Situation opérationnelle: {len(critical)} zone(s) critique(s), {len(high_risk)} zone(s) à risque élevé. Résilience moyenne: {context['avg_resilience']:.1f}/100. Déploiement tactique requis selon matrice de priorisation.",
@@ -300,30 +496,7 @@ DIRECTIVES:
                 "timeframe": "0-6h pour zones critiques, 6-24h pour zones à risque",
                 "severity_level": severity
             },
-            "region_specific_advice": [
-                {
-                    "region": r["name"],
-                    "resilience_score": r["resilience_index"],
-                    "key_vulnerabilities": [
-                        f"Exposition: {r['exposure']:.0f}/100 - Risque environnemental élevé",
-                        f"Vulnérabilité: {r['vulnerability']:.0f}/100 - Infrastructure fragile",
-                        f"Adaptation: {r['adaptation']:.0f}/100 - Capacité de réponse limitée"
-                    ],
-                    "immediate_actions": [
-                        "Pré-positionnement équipes de sauvetage en stand-by",
-                        "Activation protocole d'évacuation préventive si dégradation",
-                        "Sécurisation itinéraires d'accès pour moyens lourds",
-                        "Mise en place cellule de commandement avancée"
-                    ],
-                    "resource_needs": [
-                        f"Équipes USAR (Urban Search And Rescue) - {max(1, int(r['vulnerability']/30))} unités",
-                        f"Moyens héliportés - {1 if r['resilience_index'] < 35 else 0} hélicoptère(s)",
-                        f"Ambulances SMUR - {max(2, int(r['exposure']/25))} véhicules",
-                        "Kit d'intervention en milieu hostile"
-                    ]
-                }
-                for r in (critical + high_risk[:3])  # Top zones critiques + 3 suivantes
-            ],
+            "region_specific_advice": list(map(_format_region_advice, advice_df.itertuples(index=False))),
             "evacuation_priorities": [r["name"] for r in critical] + [r["name"] for r in high_risk[:2]],
             "resource_allocation": {
                 "helicopters": min(3, len(critical)),
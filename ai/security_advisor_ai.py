@@ -1,13 +1,14 @@
 # -*- coding: utf-8 -*-
 import os
-import json
+import re
+import asyncio
 from pathlib import Path
 from dotenv import load_dotenv
-import google.generativeai as genai
+import orjson
 import pandas as pd
-from scipy.spatial.distance import cdist
 import numpy as np
-from src.resilience import calculate_resilience, simulate_cyclone_impact, calculate_resilience_batch
+from scipy.spatial import cKDTree
+from src.resilience import simulate_cyclone_impact, calculate_resilience_batch
 
 # Charger .env
 env_path = Path(__file__).resolve().parent.parent / ".env"
@@ -17,8 +18,151 @@ API_KEY = os.getenv("GOOGLE_API_KEY")
 if not API_KEY:
     raise ValueError("GOOGLE_API_KEY not set in .env")
 
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel("gemini-2.0-flash-exp")
+# Modèle Gemini, importé et configuré au premier appel
+_model = None
+
+FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL)
+
+
+def _strip_fence(text: str) -> str:
+    """Retire le markdown autour du JSON si présent"""
+    match = FENCE_RE.search(text)
+    return match.group(1).strip() if match else text.strip()
+
+
+def _get_model():
+    """Retourne le modèle Gemini (import de google.generativeai à la demande)"""
+    global _model
+    if _model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=API_KEY)
+        # Réponse JSON demandée ; les anciennes versions du SDK peuvent encore renvoyer un bloc ```json
+        _model = genai.GenerativeModel(
+            "gemini-2.0-flash-exp",
+            generation_config={"response_mime_type": "application/json"}
+        )
+    return _model
+
+
+# Prompt des conseils citoyens
+ADVICE_PROMPT_TEMPLATE = """Tu es un expert en sécurité civile. Génère des conseils ADAPTÉS à la situation réelle.
+
+SITUATION ACTUELLE:
+- Localisation: {region_name}
+- Résilience de la zone: {resilience:.0f}/100
+- Type de catastrophe: {disaster_type}{cyclone_info}
+- Niveau de risque déterminé: {risk_level}
+
+IMPORTANT - LOGIQUE À SUIVRE:
+- Si résilience > 60 ET cyclone < 20: Zone SÛRE, PAS d'évacuation
+- Si résilience < 60 OU cyclone > 20: Zone À RISQUE, conseils adaptés
+- Si cyclone > 50: ÉVACUATION IMMÉDIATE peu importe la résilience
+
+ZONES SÛRES PROCHES:
+{safe_zones_text}
+
+ZONES À ÉVITER:
+{risk_zones_text}
+
+Génère un JSON avec des conseils COHÉRENTS avec le niveau de risque:
+
+{{
+  "location": "{region_name}",
+  "risk_level": "{risk_level}",
+  "immediate_action": "Action cohérente avec le niveau de risque (si zone sûre, ne PAS demander d'évacuer)",
+  "protection_tips": [
+    "Conseil adapté 1",
+    "Conseil adapté 2",
+    "Conseil adapté 3"
+  ],
+  "safe_zones": [
+    {{
+      "name": "Nom zone",
+      "distance_km": 0.0,
+      "resilience_score": 0,
+      "direction": "Direction",
+      "travel_time": "Temps"
+    }}
+  ],
+  "during_disaster": [
+    "Action pendant {disaster_type} 1",
+    "Action pendant {disaster_type} 2"
+  ],
+  "emergency_contacts": {{
+    "police": "999",
+    "ambulance": "114",
+    "disaster_management": "116"
+  }},
+  "evacuation_route": "Direction adaptée au niveau de risque",
+  "at_risk_zones": ["Zone 1"]
+}}
+
+RAPPEL: Si la zone est SÛRE (résilience > 60 et cyclone faible), ne pas recommander d'évacuation!
+JSON uniquement, pas de markdown."""
+
+# Lignes des zones dans le prompt
+SAFE_ZONE_LINE = "- {region_name}: Score {resilience_index:.0f}/100, Distance: {distance_km:.1f} km"
+RISK_ZONE_LINE = "- {region_name}: Score {resilience_index:.0f}/100"
+
+
+def _format_zones(zones: list, line: str, empty: str) -> str:
+    """Formate une liste de zones (une ligne par zone) pour le prompt"""
+    return "\n".join(map(line.format_map, zones)) or empty
+
+
+# Zones sûres : un tableau structuré (une colonne contiguë par champ)
+SAFE_ZONE_DTYPE = np.dtype([
+    ("region_id", object),
+    ("region_name", object),
+    ("resilience_index", np.float64),
+    ("distance_km", np.float64),
+    ("lat", np.float64),
+    ("lon", np.float64),
+])
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def _haversine_km(lat: float, lon: float, lats_rad: np.ndarray, lons_rad: np.ndarray) -> np.ndarray:
+    """Distance orthodromique (km) entre un point et un ensemble de points (en radians)"""
+    lat1 = np.radians(lat)
+    lon1 = np.radians(lon)
+    a = (
+        np.sin((lats_rad - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lats_rad) * np.sin((lons_rad - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _load_resilience_data(data_path) -> pd.DataFrame:
+    """Charge les scores de résilience (cache Parquet du CSV brut, calcul refait à chaque chargement)"""
+    csv_path = Path(data_path)
+    parquet_path = csv_path.with_suffix(".advisor.parquet")
+    df = None
+    if parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+        try:
+            df = pd.read_parquet(parquet_path)
+        except Exception as e:
+            print(f"Erreur lecture cache Parquet: {e}")
+    
+    if df is None:
+        df = pd.read_csv(csv_path, dtype={"region_id": "string"})
+        try:
+            df.to_parquet(parquet_path, index=False)
+        except Exception as e:
+            print(f"Erreur écriture cache Parquet: {e}")
+    
+    # Pas de mise en cache du calcul : poids et seuils peuvent changer sans toucher au CSV
+    return calculate_resilience_batch(df)
+
+
+def _unit_xyz(lat, lon) -> np.ndarray:
+    """Coordonnées cartésiennes sur la sphère unité (l'ordre des cordes = l'ordre orthodromique)"""
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    return np.stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1
+    )
 
 
 class SecurityAdvisor:
@@ -26,15 +170,14 @@ class SecurityAdvisor:
     
     def __init__(self, data_path="data/resilience_scores.csv"):
         # Charger les données
-        self.resilience_data = pd.read_csv(data_path)
-        self.resilience_data["resilience_index"] = self.resilience_data.apply(
-            lambda row: calculate_resilience(
-                row["exposure"],
-                row["vulnerability"],
-                row["adaptation"]
-            ),
-            axis=1
-        )
+        self.resilience_data = _load_resilience_data(data_path)
+        
+        # Index par region_id pour des recherches O(1) via .loc
+        self.resilience_data = self.resilience_data.set_index("region_id", drop=False)
+        
+        # Données sans cyclone + simulations déjà calculées (clé = intensité)
+        self._base_resilience = self.resilience_data
+        self._cyclone_cache = {0: self._base_resilience}
         
         # Coordonnées centrales des régions
         self.region_coords = {
@@ -51,6 +194,23 @@ class SecurityAdvisor:
             "MUAG": (-20.0200, 57.7500),   # North Islands
             "MUCC": (-15.8500, 59.6200),   # Saint Brandon
         }
+        
+        # Coordonnées sous forme de tableau (N×2) pour les calculs vectorisés
+        self._region_ids = list(self.region_coords.keys())
+        self._region_coords_array = np.asarray(list(self.region_coords.values()), dtype=np.float64)
+        
+        self._region_pos = {rid: i for i, rid in enumerate(self._region_ids)}
+        self._region_lat_rad = np.radians(self._region_coords_array[:, 0])
+        self._region_lon_rad = np.radians(self._region_coords_array[:, 1])
+        
+        # Index spatial sur la sphère unité (plus proche voisin en O(log N))
+        self._region_xyz = _unit_xyz(self._region_coords_array[:, 0], self._region_coords_array[:, 1])
+        self._region_tree = cKDTree(self._region_xyz)
+        
+        # Zones sûres / à risque par intensité (calculées à la demande).
+        # L'instance est partagée entre sessions : aucun état propre à une requête n'y est stocké.
+        self._safe_cache = {}
+        self._risk_cache = {}
     
     def get_advice_for_location(self, lat: float, lon: float, disaster_type: str = "cyclone", 
                                 cyclone_severity: int = 0) -> dict:
@@ -58,23 +218,11 @@ class SecurityAdvisor:
         Génère des conseils de sécurité pour une localisation GPS en temps réel.
         
         """
-        # Appliquer simulation cyclone avant génération conseils
-        if cyclone_severity > 0:
-            df = pd.DataFrame(self.resilience_data)
-            df = calculate_resilience_batch(df)
-            df = simulate_cyclone_impact(df, cyclone_severity)
-            self.resilience_data = df
-        
-        region_data = self._find_nearest_region(lat, lon)
-        
-        if not region_data:
+        situation = self._prepare_situation(lat, lon, cyclone_severity)
+        if situation is None:
             return self._generate_generic_advice(disaster_type)
         
-        # Trouver les zones sûres (résilience haute) les plus proches
-        safe_zones = self._find_safe_zones(lat, lon, exclude_region=region_data["region_id"])
-        
-        # Trouver les zones à risque (résilience basse)
-        risk_zones = self._find_risk_zones()
+        region_data, safe_zones, risk_zones = situation
         
         # Générer conseils avec IA
         advice = self._call_gemini_for_advice(
@@ -89,24 +237,76 @@ class SecurityAdvisor:
         
         return advice
     
-    def _find_nearest_region(self, lat: float, lon: float) -> dict:
-        """Trouve la région la plus proche et retourne ses données"""
-        user_pos = np.array([[lat, lon]])
-        distances = []
+    async def get_advice_batch(self, points: list, disaster_type: str = "cyclone") -> list:
+        """
+        Conseils pour plusieurs positions (lat, lon, intensité) : appels Gemini concurrents.
+        
+        """
+        pending = []
+        results = []
+        for lat, lon, cyclone_severity in points:
+            situation = self._prepare_situation(lat, lon, cyclone_severity)
+            if situation is None:
+                results.append(self._generate_generic_advice(disaster_type))
+                continue
+            
+            region_data, safe_zones, risk_zones = situation
+            prompt, risk_level, immediate_action = self._build_advice_prompt(
+                region_data, disaster_type, safe_zones, risk_zones, cyclone_severity
+            )
+            pending.append((len(results), region_data, safe_zones, prompt, risk_level, immediate_action))
+            results.append(None)
+        
+        try:
+            model = _get_model()
+            responses = await asyncio.gather(
+                *[model.generate_content_async(item[3]) for item in pending],
+                return_exceptions=True
+            )
+        except Exception as e:
+            responses = [e] * len(pending)
+        
+        for (i, region_data, safe_zones, _, risk_level, immediate_action), response in zip(pending, responses):
+            results[i] = self._parse_advice(
+                response, region_data, disaster_type, risk_level, safe_zones, immediate_action
+            )
+        
+        return results
+    
+    def _resilience_for(self, cyclone_severity: int) -> pd.DataFrame:
+        """Données de résilience après simulation cyclone (mémorisées par intensité)"""
+        df = self._cyclone_cache.get(cyclone_severity)
+        if df is None:
+            # simulate_cyclone_impact travaille sur une copie : la base reste intacte
+            df = simulate_cyclone_impact(self._base_resilience, cyclone_severity)
+            self._cyclone_cache[cyclone_severity] = df
+        return df
+    
+    def _prepare_situation(self, lat: float, lon: float, cyclone_severity: int):
+        """Région courante, zones sûres et zones à risque pour une position (None si hors zone)"""
+        region_data = self._find_nearest_region(lat, lon, cyclone_severity)
+        
+        if not region_data:
+            return None
         
-        for region_id, (r_lat, r_lon) in self.region_coords.items():
-            dist = cdist(user_pos, [[r_lat, r_lon]], metric='euclidean')[0][0]
-            distances.append((region_id, dist))
+        # Trouver les zones sûres (résilience haute) les plus proches
+        safe_zones = self._find_safe_zones(lat, lon, cyclone_severity, exclude_region=region_data["region_id"])
+        
+        # Trouver les zones à risque (résilience basse)
+        risk_zones = self._find_risk_zones(cyclone_severity)
         
-        nearest_id, _ = min(distances, key=lambda x: x[1])
-        region_row = self.resilience_data[
-            self.resilience_data["region_id"] == nearest_id
-        ]
+        return region_data, safe_zones, risk_zones
+    
+    def _find_nearest_region(self, lat: float, lon: float, cyclone_severity: int = 0) -> dict:
+        """Trouve la région la plus proche et retourne ses données"""
+        _, i = self._region_tree.query(_unit_xyz(lat, lon))
+        nearest_id = self._region_ids[int(i)]
         
-        if region_row.empty:
+        df = self._resilience_for(cyclone_severity)
+        if nearest_id not in df.index:
             return None
         
-        row = region_row.iloc[0]
+        row = df.loc[nearest_id]
         return {
             "region_id": nearest_id,
             "region_name": row["region_name"],
@@ -118,60 +318,85 @@ class SecurityAdvisor:
             "lon": self.region_coords[nearest_id][1]
         }
     
-    def _find_safe_zones(self, lat: float, lon: float, exclude_region: str = None, top_n: int = 3) -> list:
+    def _get_safe_regions(self, cyclone_severity: int) -> tuple:
+        """Régions sûres (résilience >= 60), leurs positions et leur index spatial (mémorisés par intensité)"""
+        cached = self._safe_cache.get(cyclone_severity)
+        if cached is None:
+            df = self._resilience_for(cyclone_severity)
+            safe_regions = df[
+                (df["resilience_index"] >= 60)
+                & df["region_id"].isin(self.region_coords)
+            ]
+            positions = np.asarray(
+                [self._region_pos[rid] for rid in safe_regions["region_id"]], dtype=np.intp
+            )
+            tree = cKDTree(self._region_xyz[positions]) if len(positions) else None
+            cached = (safe_regions, positions, tree)
+            self._safe_cache[cyclone_severity] = cached
+        
+        return cached
+    
+    def _find_safe_zones(self, lat: float, lon: float, cyclone_severity: int, exclude_region: str = None,
+                         top_n: int = 3) -> np.recarray:
         """Trouve les régions sûres (résilience élevée) les plus proches"""
-        user_pos = np.array([[lat, lon]])
-        safe_candidates = []
+        safe_regions, safe_positions, safe_tree = self._get_safe_regions(cyclone_severity)
+        if len(safe_regions) == 0 or top_n <= 0:
+            return np.recarray(0, dtype=SAFE_ZONE_DTYPE)
         
-        # Filtrer les régions avec résilience >= 60 (zones sûres)
-        safe_regions = self.resilience_data[self.resilience_data["resilience_index"] >= 60]
+        # top_n + 1 voisins (déjà triés par distance) pour pouvoir exclure la région courante
+        k = min(top_n + 1, len(safe_regions))
+        _, order = safe_tree.query(_unit_xyz(lat, lon), k=k)
+        order = np.atleast_1d(order)
+        order = order[(safe_regions["region_id"].to_numpy()[order] != exclude_region)][:top_n]
         
-        for _, row in safe_regions.iterrows():
-            region_id = row["region_id"]
-            if region_id == exclude_region:
-                continue
-            
-            if region_id not in self.region_coords:
-                continue
-            
-            r_lat, r_lon = self.region_coords[region_id]
-            
-            # Calculer distance en km (formule approximée)
-            dist_km = cdist(user_pos, [[r_lat, r_lon]], metric='euclidean')[0][0] * 111
-            
-            safe_candidates.append({
-                "region_id": region_id,
-                "region_name": row["region_name"],
-                "resilience_index": row["resilience_index"],
-                "distance_km": dist_km,
-                "lat": r_lat,
-                "lon": r_lon
-            })
+        # Distance orthodromique en km, seulement pour les zones retenues
+        positions = safe_positions[order]
+        distances_km = _haversine_km(lat, lon, self._region_lat_rad[positions], self._region_lon_rad[positions])
         
-        # Trier par distance et retourner les top_n
-        safe_candidates.sort(key=lambda x: x["distance_km"])
-        return safe_candidates[:top_n]
+        hits = safe_regions.iloc[order]
+        coords = self._region_coords_array[positions]
+        return np.rec.fromarrays(
+            [
+                hits["region_id"].to_numpy(dtype=object),
+                hits["region_name"].to_numpy(dtype=object),
+                hits["resilience_index"].to_numpy(dtype=np.float64),
+                distances_km,
+                coords[:, 0],
+                coords[:, 1],
+            ],
+            dtype=SAFE_ZONE_DTYPE
+        )
     
-    def _find_risk_zones(self, top_n: int = 3) -> list:
-        """Trouve les régions à risque (résilience basse)"""
-        risk_regions = self.resilience_data[
-            self.resilience_data["resilience_index"] < 40
-        ].sort_values("resilience_index")
-        
-        risk_zones = []
-        for _, row in risk_regions.head(top_n).iterrows():
-            risk_zones.append({
-                "region_name": row["region_name"],
-                "resilience_index": row["resilience_index"],
-                "exposure": row["exposure"],
-                "vulnerability": row["vulnerability"]
-            })
+    def _find_risk_zones(self, cyclone_severity: int, top_n: int = 3) -> list:
+        """Trouve les régions à risque (résilience basse), mémorisées par intensité"""
+        key = (cyclone_severity, top_n)
+        if key not in self._risk_cache:
+            df = self._resilience_for(cyclone_severity)
+            risk_regions = df[df["resilience_index"] < 40].nsmallest(top_n, "resilience_index")
+            
+            self._risk_cache[key] = risk_regions[
+                ["region_name", "resilience_index", "exposure", "vulnerability"]
+            ].to_dict(orient="records")
         
-        return risk_zones
+        return self._risk_cache[key]
     
     def _call_gemini_for_advice(self, region_data: dict, disaster_type: str, lat: float, lon: float,
-                                safe_zones: list, risk_zones: list, cyclone_severity: int = 0) -> dict:
+                                safe_zones: np.recarray, risk_zones: list, cyclone_severity: int = 0) -> dict:
         """Appelle Gemini pour générer les conseils"""
+        prompt, risk_level, immediate_action = self._build_advice_prompt(
+            region_data, disaster_type, safe_zones, risk_zones, cyclone_severity
+        )
+        
+        try:
+            response = _get_model().generate_content(prompt)
+        except Exception as e:
+            response = e
+        
+        return self._parse_advice(response, region_data, disaster_type, risk_level, safe_zones, immediate_action)
+    
+    def _build_advice_prompt(self, region_data: dict, disaster_type: str, safe_zones: np.recarray,
+                             risk_zones: list, cyclone_severity: int = 0) -> tuple:
+        """Construit le prompt + niveau de risque et action immédiate"""
         
         resilience = region_data["resilience_index"]
         
@@ -195,88 +420,33 @@ class SecurityAdvisor:
             risk_level = "BASSE - Vous êtes en zone sûre"
             immediate_action = "Vous êtes dans une zone à haute résilience. Restez informé mais pas d'évacuation nécessaire."
         
-        # Formater zones sûres
-        safe_zones_text = "\n".join([
-            f"- {z['region_name']}: Score {z['resilience_index']:.0f}/100, Distance: {z['distance_km']:.1f} km"
-            for z in safe_zones
-        ]) if safe_zones else "Aucune zone sûre à proximité"
-        
-        # Formater zones à risque
-        risk_zones_text = "\n".join([
-            f"- {z['region_name']}: Score {z['resilience_index']:.0f}/100"
-            for z in risk_zones
-        ]) if risk_zones else "Aucune zone à risque critique"
+        # Formater zones sûres / à risque
+        safe_zones_text = _format_zones(safe_zones, SAFE_ZONE_LINE, "Aucune zone sûre à proximité")
+        risk_zones_text = _format_zones(risk_zones, RISK_ZONE_LINE, "Aucune zone à risque critique")
         
         cyclone_info = f"\nCYCLONE EN COURS - Intensité: {cyclone_severity}/100" if cyclone_severity > 0 else ""
         
-        prompt = f"""Tu es un expert en sécurité civile. Génère des conseils ADAPTÉS à la situation réelle.
-
-SITUATION ACTUELLE:
-- Localisation: {region_data['region_name']}
-- Résilience de la zone: {resilience:.0f}/100
-- Type de catastrophe: {disaster_type}{cyclone_info}
-- Niveau de risque déterminé: {risk_level}
-
-IMPORTANT - LOGIQUE À SUIVRE:
-- Si résilience > 60 ET cyclone < 20: Zone SÛRE, PAS d'évacuation
-- Si résilience < 60 OU cyclone > 20: Zone À RISQUE, conseils adaptés
-- Si cyclone > 50: ÉVACUATION IMMÉDIATE peu importe la résilience
-
-ZONES SÛRES PROCHES:
-{safe_zones_text}
-
-ZONES À ÉVITER:
-{risk_zones_text}
-
-Génère un JSON avec des conseils COHÉRENTS avec le niveau de risque:
-
-{{
-  "location": "{region_data['region_name']}",
-  "risk_level": "{risk_level}",
-  "immediate_action": "Action cohérente avec le niveau de risque (si zone sûre, ne PAS demander d'évacuer)",
-  "protection_tips": [
-    "Conseil adapté 1",
-    "Conseil adapté 2",
-    "Conseil adapté 3"
-  ],
-  "safe_zones": [
-    {{
-      "name": "Nom zone",
-      "distance_km": 0.0,
-      "resilience_score": 0,
-      "direction": "Direction",
-      "travel_time": "Temps"
-    }}
-  ],
-  "during_disaster": [
-    "Action pendant {disaster_type} 1",
-    "Action pendant {disaster_type} 2"
-  ],
-  "emergency_contacts": {{
-    "police": "999",
-    "ambulance": "114",
-    "disaster_management": "116"
-  }},
-  "evacuation_route": "Direction adaptée au niveau de risque",
-  "at_risk_zones": ["Zone 1"]
-}}
-
-RAPPEL: Si la zone est SÛRE (résilience > 60 et cyclone faible), ne pas recommander d'évacuation!
-JSON uniquement, pas de markdown."""
-
+        prompt = ADVICE_PROMPT_TEMPLATE.format(
+            region_name=region_data['region_name'],
+            resilience=resilience,
+            disaster_type=disaster_type,
+            cyclone_info=cyclone_info,
+            risk_level=risk_level,
+            safe_zones_text=safe_zones_text,
+            risk_zones_text=risk_zones_text
+        )
+        
+        return prompt, risk_level, immediate_action
+    
+    def _parse_advice(self, response, region_data: dict, disaster_type: str, risk_level: str,
+                      safe_zones: np.recarray, immediate_action: str) -> dict:
+        """Lit la réponse JSON de Gemini (conseils de secours si erreur)"""
         try:
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            if "```" in response_text:
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-                response_text = response_text.split("```")[0]
+            if isinstance(response, Exception):
+                raise response
             
-            advice = json.loads(response_text)
+            advice = orjson.loads(_strip_fence(response.text))
             
-          
             advice['immediate_action'] = immediate_action
             
             return advice
@@ -286,7 +456,7 @@ JSON uniquement, pas de markdown."""
             return self._generate_fallback_advice(region_data, disaster_type, risk_level, safe_zones, immediate_action)
     
     def _generate_fallback_advice(self, region_data: dict, disaster_type: str, risk_level: str, 
-                                 safe_zones: list = None, immediate_action: str = None) -> dict:
+                                 safe_zones: np.recarray = None, immediate_action: str = None) -> dict:
         """Conseils de secours cohérents"""
         if safe_zones is None:
             safe_zones = []
@@ -1,25 +1,34 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 import numpy as np
-from streamlit_folium import st_folium
-from ai.report_ai import ReportAI
-from ai.security_advisor_ai import SecurityAdvisor
+import os
 from streamlit_geolocation import streamlit_geolocation
 from datetime import datetime
 from io import BytesIO
 from src.data_loader import merge_data, load_hazard_zones
-from src.resilience import calculate_resilience_batch, simulate_cyclone_impact, get_cyclone_category
+from src.resilience import (
+    calculate_resilience_batch,
+    simulate_cyclone_impact,
+    simulate_cyclone_scenarios,
+    get_cyclone_category
+)
 from src.map_generator import create_base_map, add_resilience_layer, add_hazard_layer, add_legend
 from src.alerts import generate_summary_stats, get_evacuation_list
 from src.citizen_alerts import (
     save_alert,
     get_all_alerts_summary,
     get_region_alert_stats,
-    clear_old_alerts
+    clear_old_alerts,
+    ALERTS_FILE
 )
 
 
 
+# Copy-on-Write : les sous-tableaux en lecture seule ne copient rien (déjà actif avec pandas >= 3)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # CONFIGURATION
 st.set_page_config(
     page_title="IslandGuard 🇲🇺",
@@ -29,8 +38,8 @@ st.set_page_config(
 
 
 
-# CSS
-st.markdown("""
+# CSS + en-tête (émis en un seul bloc au début de main)
+APP_CSS = """
 <style>
     .main-header {
         background: linear-gradient(135deg, #1a9850 0%, #0d5c2c 100%);
@@ -70,7 +79,7 @@ st.markdown("""
         .stButton button { width: 100% !important; }
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 
 
 
@@ -83,9 +92,9 @@ if 'alert_sent' not in st.session_state:
 
 
 # FONCTIONS UTILITAIRES
-@st.cache_data
+@st.cache_resource(show_spinner=False)
 def load_base_data():
-    """Charge les données de base"""
+    """Charge les données de base (objet partagé, à traiter en lecture seule)"""
     try:
         df = merge_data()
         df = calculate_resilience_batch(df)
@@ -95,13 +104,164 @@ def load_base_data():
         return None
 
 
-def play_alert_sound():
-    """Notification sonore pour alertes critiques"""
-    st.markdown("""
+# Valeurs possibles du slider d'intensité
+CYCLONE_SEVERITIES = range(0, 101, 5)
+
+
+@st.cache_resource(show_spinner=False)
+def cyclone_scenarios(_base_df):
+    """Les 21 simulations du slider, calculées en un seul passage vectorisé"""
+    return simulate_cyclone_scenarios(_base_df, CYCLONE_SEVERITIES)
+
+
+def simulate_cyclone_cached(_base_df, cyclone_severity):
+    """Simulation cyclone lue dans la table précalculée (calcul direct hors table)"""
+    scenarios = cyclone_scenarios(_base_df)
+    if cyclone_severity in scenarios:
+        return scenarios[cyclone_severity]
+    return simulate_cyclone_impact(_base_df, cyclone_severity)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_hazard_zones_cached():
+    """Zones à risque (GeoJSON) chargées une fois par heure"""
+    return load_hazard_zones()
+
+
+@st.cache_resource(show_spinner=False)
+def region_positions(_base_df):
+    """Nom de région → position de ligne (même ordre pour toutes les simulations)"""
+    positions = {}
+    for i, name in enumerate(_base_df['region_name'].to_numpy()):
+        positions.setdefault(name, i)
+    return positions
+
+
+@st.cache_resource(show_spinner=False)
+def sorted_region_names(_base_df):
+    """Liste triée des régions pour le sélecteur citoyen (identique pour toutes les simulations)"""
+    return sorted(_base_df['region_name'].unique())
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def summary_stats_cached(_df, cyclone_severity):
+    """Statistiques globales par intensité (les alertes ne les modifient pas)"""
+    return generate_summary_stats(_df)
+
+
+def alerts_mtime():
+    """Version du fichier d'alertes : (date en ns, taille), (0, 0) s'il n'existe pas encore"""
+    try:
+        stat = os.stat(ALERTS_FILE)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return (0, 0)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def alerts_summary_cached(_df, cyclone_severity, mtime):
+    """Alertes citoyennes jointes aux régions (recalculé quand alerts.jsonl change, lecture seule)"""
+    return get_all_alerts_summary(_df)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def export_csv_bytes(_display_df, cyclone_severity, mtime):
+    """CSV de l'onglet Analyse, sérialisé une fois par (intensité, version des alertes)"""
+    buffer = BytesIO()
+    _display_df.to_csv(buffer, index=False, encoding='utf-8')
+    return buffer.getvalue()
+
+
+def rescue_aggregates(df, cyclone_severity):
+    """Compteurs du tableau de bord secours en un seul passage sur les tableaux NumPy"""
+    danger = df['citizen_danger'].to_numpy()
+    safe = df['citizen_safe'].to_numpy()
+    # Régions low/critical : masque déjà calculé avec les statistiques globales
+    critical_mask = summary_stats_cached(df, cyclone_severity)['at_risk_mask']
+    
+    return {
+        'danger': int(danger.sum()),
+        'safe': int(safe.sum()),
+        'critical_mask': critical_mask,
+        'critical_count': int(critical_mask.sum())
+    }
+
+
+@st.cache_resource(ttl=3600, show_spinner=False, max_entries=64)
+def render_map_html(cyclone_severity, _df, with_hazards=False):
+    """HTML de la carte de résilience, mémorisé par intensité (les alertes n'y changent rien)"""
+    # Même TTL que load_hazard_zones_cached : la couche des zones à risque se rafraîchit avec elle
+    map_obj = create_base_map()
+    map_obj = add_resilience_layer(map_obj, _df)
+
+    if with_hazards:
+        try:
+            hazard_gdf = load_hazard_zones_cached()
+            if len(hazard_gdf) > 0:
+                map_obj = add_hazard_layer(map_obj, hazard_gdf)
+        except:
+            pass
+
+    map_obj = add_legend(map_obj)
+    return map_obj.get_root().render()
+
+
+def show_map(df, cyclone_severity, height, width=None, with_hazards=False):
+    """Affiche la carte (aucun clic n'est exploité, pas besoin de st_folium)"""
+    html = render_map_html(cyclone_severity, df, with_hazards)
+    components.html(html, width=width, height=height)
+
+
+@st.cache_resource(show_spinner=False)
+def get_security_advisor():
+    """SecurityAdvisor unique par processus (import de Gemini seulement à la première demande)"""
+    from ai.security_advisor_ai import SecurityAdvisor
+    return SecurityAdvisor()
+
+
+HEADER_HTML = """
+<div class="main-header">
+    <h1> IslandGuard 🇲🇺</h1>
+    <p>Système de surveillance de la résilience climatique de l'île Maurice</p>
+</div>
+"""
+
+FOOTER_HTML = """
+        <div style="text-align: center; padding: 20px;">
+            <p style="color: gray; margin-bottom: 10px;">IslandGuard 🇲🇺 | Code4Good Hackathon 2025</p>
+            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
+                        padding: 10px 20px; 
+                        border-radius: 20px; 
+                        display: inline-block;">
+                <span style="color: white; font-weight: bold;">⚡ Powered by Google Gemini AI</span>
+            </div>
+        </div>
+"""
+
+ALERT_SOUND_HTML = """
         <audio autoplay>
             <source src="https://assets.mixkit.co/active_storage/sfx/2869/2869.wav" type="audio/wav">
         </audio>
-    """, unsafe_allow_html=True)
+"""
+
+# Son déjà émis pendant cette exécution du script (remis à zéro à chaque rerun)
+_alert_sound_played = False
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def get_report_ai(mtime):
+    """ReportAI partagé, reconstruit seulement quand alerts.jsonl change (il fige les alertes)"""
+    from ai.report_ai import ReportAI
+    return ReportAI()
+
+
+def play_alert_sound():
+    """Notification sonore pour alertes critiques (une seule fois par rerun)"""
+    global _alert_sound_played
+    if _alert_sound_played:
+        return
+    _alert_sound_played = True
+    st.markdown(ALERT_SOUND_HTML, unsafe_allow_html=True)
 
 
 def generate_pdf_report(advice, region_name, cyclone_severity):
@@ -109,7 +269,7 @@ def generate_pdf_report(advice, region_name, cyclone_severity):
     Génère un PDF du rapport IA
     
     Returns:
-        BytesIO: Buffer contenant le PDF
+        bytes: Contenu du PDF
     """
     try:
         from fpdf import FPDF
@@ -169,13 +329,11 @@ def generate_pdf_report(advice, region_name, cyclone_severity):
         pdf.set_font("Arial", "I", 8)
         pdf.cell(0, 5, "Powered by Google Gemini AI - IslandGuard 2025", align="C")
         
-        # Sauvegarder dans buffer
-        pdf_output = BytesIO()
-        pdf_string = pdf.output(dest='S').encode('latin-1')
-        pdf_output.write(pdf_string)
-        pdf_output.seek(0)
-        
-        return pdf_output
+        # fpdf2 renvoie un bytearray, PyFPDF 1.7 une chaîne latin-1
+        pdf_data = pdf.output(dest='S')
+        if isinstance(pdf_data, str):
+            return pdf_data.encode('latin-1')
+        return bytes(pdf_data)
         
     except Exception as e:
         st.error(f" Erreur génération PDF: {e}")
@@ -189,13 +347,8 @@ def generate_pdf_report(advice, region_name, cyclone_severity):
 def main():
     """Fonction principale"""
     
-    # Header
-    st.markdown("""
-    <div class="main-header">
-        <h1> IslandGuard 🇲🇺</h1>
-        <p>Système de surveillance de la résilience climatique de l'île Maurice</p>
-    </div>
-    """, unsafe_allow_html=True)
+    # CSS + Header
+    st.markdown(APP_CSS + HEADER_HTML, unsafe_allow_html=True)
     
     # Chargement données
     with st.spinner(" Chargement des données..."):
@@ -233,10 +386,10 @@ def main():
         st.subheader(" Simulateur Cyclone")
         cyclone_severity = st.slider(
             "Intensité du cyclone",
-            min_value=0,
-            max_value=100,
+            min_value=CYCLONE_SEVERITIES.start,
+            max_value=CYCLONE_SEVERITIES.stop - 1,
             value=0,
-            step=5
+            step=CYCLONE_SEVERITIES.step
         )
         
         cyclone_cat = get_cyclone_category(cyclone_severity)
@@ -251,26 +404,26 @@ def main():
         
         # Appliquer simulation
         if cyclone_severity > 0:
-            df = simulate_cyclone_impact(base_df, cyclone_severity)
+            df = simulate_cyclone_cached(base_df, cyclone_severity)
         else:
-            df = base_df.copy()
+            df = base_df
         
         # Ajouter alertes citoyennes
-        df = get_all_alerts_summary(df)
+        df = alerts_summary_cached(df, cyclone_severity, alerts_mtime())
         
         st.divider()
         
         # SÉLECTION RÉGION (pour citoyen)
         if user_role == "Citoyen":
             st.subheader(" Ma Région")
-            regions_list = sorted(df['region_name'].unique())
+            regions_list = sorted_region_names(base_df)
             selected_region = st.selectbox("Sélectionnez votre région", regions_list)
         
         st.divider()
         
         # STATS GLOBALES
         st.subheader(" Statistiques")
-        stats = generate_summary_stats(df)
+        stats = summary_stats_cached(df, cyclone_severity)
         
         col1, col2 = st.columns(2)
         with col1:
@@ -283,7 +436,8 @@ def main():
   
     # ROUTAGE INTERFACES
     if user_role == "Citoyen":
-        render_citizen_interface(df, selected_region, cyclone_severity)
+        region_data = df.iloc[region_positions(base_df)[selected_region]]
+        render_citizen_interface(df, region_data, selected_region, cyclone_severity)
     else:
         render_rescue_interface(df, cyclone_severity, base_df)
     
@@ -293,28 +447,17 @@ def main():
     col1, col2, col3 = st.columns([1, 2, 1])
     
     with col2:
-        st.markdown("""
-        <div style="text-align: center; padding: 20px;">
-            <p style="color: gray; margin-bottom: 10px;">IslandGuard 🇲🇺 | Code4Good Hackathon 2025</p>
-            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-                        padding: 10px 20px; 
-                        border-radius: 20px; 
-                        display: inline-block;">
-                <span style="color: white; font-weight: bold;">⚡ Powered by Google Gemini AI</span>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(FOOTER_HTML, unsafe_allow_html=True)
 
 
 
 # INTERFACE CITOYEN
-def render_citizen_interface(df, selected_region, cyclone_severity):
+def render_citizen_interface(df, region_data, selected_region, cyclone_severity):
     """Interface pour les citoyens"""
     
     st.header(" Interface Citoyen")
     
     # INFO RÉGION
-    region_data = df[df['region_name'] == selected_region].iloc[0]
     resilience = region_data['resilience_index']
     category = region_data['category']
     
@@ -378,11 +521,7 @@ def render_citizen_interface(df, selected_region, cyclone_severity):
     # CARTE
     st.subheader(" Carte de Résilience")
     
-    map_obj = create_base_map()
-    map_obj = add_resilience_layer(map_obj, df)
-    map_obj = add_legend(map_obj)
-    
-    st_folium(map_obj, width=None, height=500, use_container_width=True, key="citizen_map")
+    show_map(df, cyclone_severity, height=500)
     
     st.divider()
     
@@ -390,7 +529,7 @@ def render_citizen_interface(df, selected_region, cyclone_severity):
     st.title(" Conseils de Sécurité IA")
 
     try:
-        advisor = SecurityAdvisor()
+        advisor = get_security_advisor()
 
         st.write(" Autorisez la géolocalisation pour obtenir des conseils personnalisés.")
 
@@ -406,8 +545,7 @@ def render_citizen_interface(df, selected_region, cyclone_severity):
             longitude = loc["longitude"]
             
             # Trouver région
-            temp_advisor = SecurityAdvisor()
-            nearest_region = temp_advisor._find_nearest_region(latitude, longitude)
+            nearest_region = advisor._find_nearest_region(latitude, longitude, cyclone_severity)
             
             if nearest_region:
                 st.success(f" Vous êtes à: **{nearest_region['region_name']}**")
@@ -472,22 +610,23 @@ def render_rescue_interface(df, cyclone_severity, base_df):
     st.header(" Interface Secours / Gouvernement")
     
     # COMPTEURS LIVE
+    aggregates = rescue_aggregates(df, cyclone_severity)
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        total_alerts = int(df['citizen_danger'].sum() + df['citizen_safe'].sum())
+        total_alerts = aggregates['danger'] + aggregates['safe']
         st.metric(" Alertes Total", total_alerts)
 
     with col2:
-        danger_count = int(df['citizen_danger'].sum())
+        danger_count = aggregates['danger']
         st.metric(" En Danger", danger_count)
 
     with col3:
-        safe_count = int(df['citizen_safe'].sum())
+        safe_count = aggregates['safe']
         st.metric(" En Sécurité", safe_count)
 
     with col4:
-        critical_regions = len(df[df['category'].isin(['low', 'critical'])])
+        critical_regions = aggregates['critical_count']
         st.metric(" Régions Critiques", critical_regions)
         if critical_regions > 0:
             play_alert_sound()
@@ -508,46 +647,39 @@ def render_rescue_interface(df, cyclone_severity, base_df):
     with tabs[0]:
         st.subheader(" Carte Opérationnelle")
         
-        map_obj = create_base_map()
-        map_obj = add_resilience_layer(map_obj, df)
-        
-        try:
-            hazard_gdf = load_hazard_zones()
-            if len(hazard_gdf) > 0:
-                map_obj = add_hazard_layer(map_obj, hazard_gdf)
-        except:
-            pass
-        
-        map_obj = add_legend(map_obj)
-        st_folium(map_obj, width=None, height=600, use_container_width=True, key="rescue_map")
+        show_map(df, cyclone_severity, height=600, with_hazards=True)
     
     # TAB 2: ALERTES
     with tabs[1]:
         st.subheader(" Alertes Citoyennes")
         
         critical_regions = df[
-            (df['citizen_danger_ratio'] > 0.5) | (df['category'].isin(['low', 'critical']))
+            (df['citizen_danger_ratio'].to_numpy() > 0.5) | aggregates['critical_mask']
         ].sort_values('citizen_danger_ratio', ascending=False)
         
         if len(critical_regions) > 0:
             st.error(f" {len(critical_regions)} région(s) critiques")
             
-            for _, region in critical_regions.iterrows():
-                col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
-                with col1:
-                    st.write(f"**{region['region_name']}**")
-                with col2:
-                    st.metric("🚨", int(region['citizen_danger']))
-                with col3:
-                    st.metric("✅", int(region['citizen_safe']))
-                with col4:
-                    ratio = region['citizen_danger_ratio']
-                    if ratio > 0.7:
-                        st.error(f"{ratio*100:.0f}%")
-                    elif ratio > 0.4:
-                        st.warning(f"{ratio*100:.0f}%")
-                    else:
-                        st.info(f"{ratio*100:.0f}%")
+            # Un seul tableau au lieu de 4 widgets par région
+            display = pd.DataFrame({
+                'region_name': critical_regions['region_name'],
+                'citizen_danger': critical_regions['citizen_danger'].astype(int),
+                'citizen_safe': critical_regions['citizen_safe'].astype(int),
+                'danger_pct': critical_regions['citizen_danger_ratio'] * 100
+            })
+            st.dataframe(
+                display,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'region_name': st.column_config.TextColumn("Région"),
+                    'citizen_danger': st.column_config.NumberColumn("🚨"),
+                    'citizen_safe': st.column_config.NumberColumn("✅"),
+                    'danger_pct': st.column_config.ProgressColumn(
+                        "Danger", min_value=0, max_value=100, format="%.0f%%"
+                    )
+                }
+            )
         else:
             st.success(" Aucune alerte critique")
         
@@ -566,8 +698,8 @@ def render_rescue_interface(df, cyclone_severity, base_df):
         
         if len(evacuation_list) > 0:
             st.error(f" {len(evacuation_list)} région(s) à évacuer")
-            for _, region in evacuation_list.iterrows():
-                st.warning(f"**{region['region_name']}** - {region['resilience_index']:.1f}/100")
+            for name, index in zip(evacuation_list['region_name'], evacuation_list['resilience_index'].to_numpy()):
+                st.warning(f"**{name}** - {index:.1f}/100")
         else:
             st.success(" Aucune évacuation nécessaire")
     
@@ -579,17 +711,15 @@ def render_rescue_interface(df, cyclone_severity, base_df):
             'region_name', 'resilience_index', 'category',
             'citizen_danger', 'citizen_safe',
             'exposure', 'vulnerability', 'adaptation'
-        ]].copy()
-        
-        display_df.columns = [
+        ]].set_axis([
             'Région', 'Résilience', 'Catégorie',
             ' Danger', ' Sécurité',
             'Exposition', 'Vulnérabilité', 'Adaptation'
-        ]
+        ], axis=1)
         
         st.dataframe(display_df, use_container_width=True)
         
-        csv = display_df.to_csv(index=False)
+        csv = export_csv_bytes(display_df, cyclone_severity, alerts_mtime())
         st.download_button(
             " Exporter CSV",
             data=csv,
@@ -601,50 +731,46 @@ def render_rescue_interface(df, cyclone_severity, base_df):
     with tabs[4]:
         st.subheader(" Comparaison Avant/Après")
         
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("###  AVANT")
-            before_stats = generate_summary_stats(base_df)
-            st.metric("Résilience", f"{before_stats['avg_resilience']:.1f}")
-            st.metric("Sûres", before_stats['safe_regions'])
-            st.metric("À risque", before_stats['at_risk_regions'])
+        if cyclone_severity == 0:
+            # Sans cyclone, "après" est identique à "avant"
+            st.info(" Pas de simulation active : choisissez une intensité de cyclone pour comparer")
+        else:
+            col1, col2 = st.columns(2)
             
-            map_before = create_base_map()
-            map_before = add_resilience_layer(map_before, base_df)
-            map_before = add_legend(map_before)
-            st_folium(map_before, width=350, height=300, key="map_before")
-        
-        with col2:
-            st.markdown(f"###  APRÈS ({cyclone_severity})")
-            after_stats = generate_summary_stats(df)
-            st.metric("Résilience", f"{after_stats['avg_resilience']:.1f}", 
-                     delta=f"{after_stats['avg_resilience'] - before_stats['avg_resilience']:.1f}")
-            st.metric("Sûres", after_stats['safe_regions'],
-                     delta=after_stats['safe_regions'] - before_stats['safe_regions'])
-            st.metric("À risque", after_stats['at_risk_regions'],
-                     delta=after_stats['at_risk_regions'] - before_stats['at_risk_regions'])
+            with col1:
+                st.markdown("###  AVANT")
+                before_stats = summary_stats_cached(base_df, 0)
+                st.metric("Résilience", f"{before_stats['avg_resilience']:.1f}")
+                st.metric("Sûres", before_stats['safe_regions'])
+                st.metric("À risque", before_stats['at_risk_regions'])
+                
+                show_map(base_df, 0, width=350, height=300)
             
-            map_after = create_base_map()
-            map_after = add_resilience_layer(map_after, df)
-            map_after = add_legend(map_after)
-            st_folium(map_after, width=350, height=300, key="map_after")
+            with col2:
+                st.markdown(f"###  APRÈS ({cyclone_severity})")
+                after_stats = summary_stats_cached(df, cyclone_severity)
+                st.metric("Résilience", f"{after_stats['avg_resilience']:.1f}", 
+                         delta=f"{after_stats['avg_resilience'] - before_stats['avg_resilience']:.1f}")
+                st.metric("Sûres", after_stats['safe_regions'],
+                         delta=after_stats['safe_regions'] - before_stats['safe_regions'])
+                st.metric("À risque", after_stats['at_risk_regions'],
+                         delta=after_stats['at_risk_regions'] - before_stats['at_risk_regions'])
+                
+                show_map(df, cyclone_severity, width=350, height=300)
     
     # TAB 6: RAPPORT IA
     with tabs[5]:
         st.subheader(" Rapport IA")
 
         try:
-            advisor = ReportAI()
+            advisor = get_report_ai(alerts_mtime())
 
-            regions = ["Île Maurice (toutes régions)"] + list(advisor.resilience_data["region_name"].unique())
+            regions = ["Île Maurice (toutes régions)"] + list(advisor.region_ids_by_name)
             selected = st.selectbox(" Région:", regions)
 
             region_id = None
             if selected != "Île Maurice (toutes régions)":
-                region_id = advisor.resilience_data[
-                    advisor.resilience_data["region_name"] == selected
-                ]["region_id"].values[0]
+                region_id = advisor.region_ids_by_name[selected]
 
             if st.button(" Générer Rapport IA"):
                 with st.spinner(" Analyse IA en cours..."):
@@ -654,11 +780,11 @@ def render_rescue_interface(df, cyclone_severity, base_df):
                         st.success(" Rapport généré!")
                         
                         # BOUTON EXPORT PDF
-                        pdf_buffer = generate_pdf_report(advice, selected, cyclone_severity)
-                        if pdf_buffer:
+                        pdf_bytes = generate_pdf_report(advice, selected, cyclone_severity)
+                        if pdf_bytes:
                             st.download_button(
                                 label=" Télécharger Rapport PDF",
-                                data=pdf_buffer,
+                                data=pdf_bytes,
                                 file_name=f"rapport_islandguard_{selected}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
                                 mime="application/pdf",
                                 type="primary"
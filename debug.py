@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from src.data_loader import merge_data
 from src.resilience import calculate_resilience_batch
@@ -14,24 +15,20 @@ df = calculate_resilience_batch(df)
 print("\nRÉSULTATS PAR RÉGION:")
 print("-" * 60)
 
-for _, row in df.iterrows():
-    E = row['exposure']
-    V = row['vulnerability']
-    A = row['adaptation']
-    
-    # Calcul manuel
-    risk = (0.45 * E) + (0.35 * V) - (0.20 * A)
-    resilience = 100 - risk
-    
-    # Catégorie
-    if resilience < 40:
-        cat = "LOW (ROUGE)"
-    elif resilience < 70:
-        cat = "MEDIUM (JAUNE)"
-    else:
-        cat = "HIGH (VERT)"
-    
-    print(f"{row['region_name']:25s} | E={E:5.1f} V={V:5.1f} A={A:5.1f} → Résilience={resilience:5.1f} {cat}")
+# Calcul manuel (vectorisé sur toutes les régions)
+E = df['exposure'].to_numpy(dtype=float)
+V = df['vulnerability'].to_numpy(dtype=float)
+A = df['adaptation'].to_numpy(dtype=float)
+resilience = 100 - ((0.45 * E) + (0.35 * V) - (0.20 * A))
+
+# Catégorie : < 40 LOW, < 70 MEDIUM, sinon HIGH
+labels = np.array(["LOW (ROUGE)", "MEDIUM (JAUNE)", "HIGH (VERT)"])
+cats = labels[np.searchsorted([40, 70], resilience, side='right')]
+
+print("\n".join(
+    f"{name:25s} | E={e:5.1f} V={v:5.1f} A={a:5.1f} → Résilience={r:5.1f} {cat}"
+    for name, e, v, a, r, cat in zip(df['region_name'], E, V, A, resilience, cats)
+))
 
 print("\nSTATISTIQUES:")
 print(f"Résilience MIN:  {df['resilience_index'].min():.1f}")
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 
@@ -7,15 +8,19 @@ def generate_summary_stats(df):
     
     """
     total_regions = len(df)
-    safe_regions = len(df[df['category'] == 'high'])
-    at_risk_regions = len(df[df['category'].isin(['low', 'critical'])])
+    # Comptage par libellé : marche pour une colonne texte ou un Categorical quel que soit son ordre
+    counts = df['category'].value_counts()
+    at_risk_mask = df['category'].isin(['critical', 'low']).to_numpy()
+    safe_regions = int(counts.get('high', 0))
+    at_risk_regions = int(counts.get('critical', 0) + counts.get('low', 0))
     avg_resilience = df['resilience_index'].mean()
     
     return {
         'total_regions': total_regions,
         'safe_regions': safe_regions,
         'at_risk_regions': at_risk_regions,
-        'avg_resilience': avg_resilience
+        'avg_resilience': avg_resilience,
+        'at_risk_mask': at_risk_mask
     }
 
 
@@ -24,22 +29,52 @@ def get_evacuation_list(df, threshold=40):
     Retourne la liste des régions nécessitant une évacuation
     
     """
-    evacuation_needed = df[df['resilience_index'] < threshold].copy()
-    evacuation_needed = evacuation_needed.sort_values('resilience_index')
+    evacuation_needed = df[df['resilience_index'] < threshold].sort_values('resilience_index')
     
     return evacuation_needed
 
 
+# Message citoyen par catégorie (zone sûre par défaut)
+CITIZEN_ALERT_TEMPLATES = {
+    'critical': "🚨 ALERTE CRITIQUE - {region_name}: Évacuation immédiate recommandée (résilience: {resilience_index:.1f}/100)",
+    'low': "🟠 ALERTE - {region_name}: Préparez-vous à évacuer (résilience: {resilience_index:.1f}/100)",
+    'medium': "⚠️ VIGILANCE - {region_name}: Restez informé (résilience: {resilience_index:.1f}/100)",
+}
+SAFE_ALERT_TEMPLATE = "✅ {region_name}: Zone sûre (résilience: {resilience_index:.1f}/100)"
+
+
 def generate_citizen_alert(region_name, resilience_index, category):
     """
     Génère un message d'alerte pour les citoyens
     
     """
-    if category == 'critical':
-        return f"🚨 ALERTE CRITIQUE - {region_name}: Évacuation immédiate recommandée (résilience: {resilience_index:.1f}/100)"
-    elif category == 'low':
-        return f"🟠 ALERTE - {region_name}: Préparez-vous à évacuer (résilience: {resilience_index:.1f}/100)"
-    elif category == 'medium':
-        return f"⚠️ VIGILANCE - {region_name}: Restez informé (résilience: {resilience_index:.1f}/100)"
-    else:
-        return f"✅ {region_name}: Zone sûre (résilience: {resilience_index:.1f}/100)"
\ No newline at end of file
+    template = CITIZEN_ALERT_TEMPLATES.get(category, SAFE_ALERT_TEMPLATE)
+    return template.format(region_name=region_name, resilience_index=resilience_index)
+
+
+def _split_alert_template(template):
+    """Découpe un modèle en (début, milieu, fin) autour du nom et de l'indice"""
+    head, rest = template.split('{region_name}')
+    middle, tail = rest.split('{resilience_index:.1f}')
+    return head, middle, tail
+
+
+def generate_citizen_alerts_batch(df):
+    """
+    Génère les messages d'alerte citoyens pour toutes les régions d'un coup
+    
+    """
+    categories = list(CITIZEN_ALERT_TEMPLATES)
+    parts = [_split_alert_template(CITIZEN_ALERT_TEMPLATES[c]) for c in categories]
+    safe_parts = _split_alert_template(SAFE_ALERT_TEMPLATE)
+    conds = [df['category'].eq(c).to_numpy() for c in categories]
+    
+    head, middle, tail = (
+        np.select(conds, [p[i] for p in parts], default=safe_parts[i]).astype(object)
+        for i in range(3)
+    )
+    # Même arrondi que le format '{:.1f}' du message unitaire
+    index_str = np.char.mod('%.1f', df['resilience_index'].to_numpy(dtype='float64')).astype(object)
+    
+    messages = head + df['region_name'].astype(str).to_numpy(dtype=object) + middle + index_str + tail
+    return pd.Series(messages, index=df.index, name='citizen_alert')
@@ -1,36 +1,56 @@
-import json
-from datetime import datetime
+import orjson
+from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 import pandas as pd
 
 
-ALERTS_FILE = 'data/alerts.json'
+ALERTS_FILE = 'data/alerts.jsonl'
+LEGACY_ALERTS_FILE = 'data/alerts.json'
+
+
+def _alert_line(alert):
+    """Une alerte en JSON compact, sur une ligne (octets)"""
+    return orjson.dumps(alert, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
 
 
 def initialize_alerts_file():
-    """Crée le fichier alerts.json s'il n'existe pas"""
+    """Crée le fichier alerts.jsonl s'il n'existe pas (reprend l'ancien alerts.json)"""
     Path('data').mkdir(exist_ok=True)
     if not Path(ALERTS_FILE).exists():
-        with open(ALERTS_FILE, 'w') as f:
-            json.dump([], f)
+        legacy = []
+        if Path(LEGACY_ALERTS_FILE).exists():
+            try:
+                legacy = orjson.loads(Path(LEGACY_ALERTS_FILE).read_bytes())
+            except:
+                legacy = []
+        Path(ALERTS_FILE).write_bytes(b''.join(_alert_line(a) for a in legacy))
 
 
-def load_alerts():
-    """Charge les alertes citoyennes"""
-    initialize_alerts_file()
+@lru_cache(maxsize=1)
+def _load_alerts_cached(mtime_ns, size):
+    """Lecture du fichier d'alertes (une par version du fichier)"""
     try:
-        with open(ALERTS_FILE, 'r') as f:
-            return json.load(f)
+        data = Path(ALERTS_FILE).read_bytes()
+        return [orjson.loads(line) for line in data.splitlines() if line.strip()]
     except:
         return []
 
 
+def load_alerts():
+    """Charge les alertes citoyennes (relues seulement si le fichier a changé, lecture seule)"""
+    initialize_alerts_file()
+    # La taille complète la date : deux ajouts dans le même tick d'horloge restent distincts
+    stat = Path(ALERTS_FILE).stat()
+    return _load_alerts_cached(stat.st_mtime_ns, stat.st_size)
+
+
 def save_alert(region_id, alert_type):
     """
     Enregistre une alerte citoyenne
     
     """
-    alerts = load_alerts()
+    initialize_alerts_file()
     
     new_alert = {
         'id': f"{region_id}_{datetime.now().timestamp()}",
@@ -39,11 +59,11 @@ def save_alert(region_id, alert_type):
         'timestamp': datetime.now().isoformat()
     }
     
-    alerts.append(new_alert)
-    
+    # Ajout d'une ligne en fin de fichier : ni relecture ni réécriture complète
     try:
-        with open(ALERTS_FILE, 'w') as f:
-            json.dump(alerts, f, indent=2)
+        with open(ALERTS_FILE, 'ab') as f:
+            f.write(_alert_line(new_alert))
+        _load_alerts_cached.cache_clear()
         return True
     except:
         return False
@@ -74,33 +94,35 @@ def get_all_alerts_summary(df):
     Résumé global des alertes pour toutes les régions
 
     """
-    alerts_data = []
+    # Une seule lecture + un seul groupby pour toutes les régions
+    alerts = pd.DataFrame(load_alerts(), columns=['region_id', 'type'])
+    counts = pd.DataFrame({
+        'region_id': alerts['region_id'],
+        'citizen_danger': (alerts['type'] == 'danger').astype('int64'),
+        'citizen_safe': (alerts['type'] == 'safe').astype('int64'),
+        'citizen_total': 1
+    })
+    
+    alerts_df = counts.groupby('region_id').sum().reindex(
+        df['region_id'].unique(), fill_value=0
+    ).astype('int64')
     
-    for region_id in df['region_id'].unique():
-        stats = get_region_alert_stats(region_id)
-        alerts_data.append({
-            'region_id': region_id,
-            'citizen_danger': stats['danger_count'],
-            'citizen_safe': stats['safe_count'],
-            'citizen_total': stats['total_count'],
-            'citizen_danger_ratio': stats['danger_ratio']
-        })
+    total = alerts_df['citizen_total']
+    alerts_df['citizen_danger_ratio'] = (alerts_df['citizen_danger'] / total.where(total > 0)).fillna(0.0)
     
-    alerts_df = pd.DataFrame(alerts_data)
-    return df.merge(alerts_df, on='region_id', how='left').fillna(0)
+    alerts_df = alerts_df.rename_axis('region_id').reset_index()
+    return df.merge(alerts_df, on='region_id', how='left', validate='many_to_one').fillna(0)
 
 
 def clear_old_alerts(hours=24):
     """Nettoie les alertes de plus de X heures"""
     alerts = load_alerts()
-    cutoff = datetime.now().timestamp() - (hours * 3600)
+    # Les dates ISO 8601 se trient comme des chaînes : une comparaison suffit
+    cutoff_iso = (datetime.now() - timedelta(hours=hours)).isoformat()
     
-    filtered = [
-        a for a in alerts 
-        if datetime.fromisoformat(a['timestamp']).timestamp() > cutoff
-    ]
+    filtered = [a for a in alerts if a['timestamp'] > cutoff_iso]
     
-    with open(ALERTS_FILE, 'w') as f:
-        json.dump(filtered, f, indent=2)
+    Path(ALERTS_FILE).write_bytes(b''.join(_alert_line(a) for a in filtered))
+    _load_alerts_cached.cache_clear()
     
     return len(alerts) - len(filtered)
\ No newline at end of file
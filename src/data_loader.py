@@ -8,6 +8,19 @@ def load_regions_geojson(filepath='data/mauritius_regions.geojson'):
     Charge les régions géographiques depuis GeoJSON.
 
     """
+    # Cache Parquet des géométries déjà simplifiées, à côté du GeoJSON
+    cache_path = Path(filepath).with_suffix('.simplified.parquet')
+    try:
+        if cache_path.exists() and cache_path.stat().st_mtime >= Path(filepath).stat().st_mtime:
+            gdf = gpd.read_parquet(cache_path)
+            # Marqueur d'IDs générés, si les métadonnées Parquet ne l'ont pas conservé
+            if 'synthetic_ids' not in gdf.attrs:
+                gdf.attrs['synthetic_ids'] = bool(gdf['region_id'].astype(str).str.startswith('TEMP_').all())
+            print(f"{len(gdf)} régions prêtes (cache)")
+            return gdf
+    except Exception as e:
+        print(f"Erreur lecture cache régions: {e}")
+    
     try:
         gdf = gpd.read_file(filepath)
         
@@ -22,13 +35,17 @@ def load_regions_geojson(filepath='data/mauritius_regions.geojson'):
             # Créer IDs temporaires basés sur l'INDEX
             gdf['region_id'] = [f"TEMP_{i:02d}" for i in range(len(gdf))]
             gdf['region_name'] = [f"Région {i+1}" for i in range(len(gdf))]
+            gdf.attrs['synthetic_ids'] = True
             
             print(f"{len(gdf)} IDs générés: TEMP_00, TEMP_01, ...")
         
-        # Si region_id existe mais pas region_name
-        elif 'region_name' not in gdf.columns:
-            gdf['region_name'] = gdf['region_id']
-            print("region_name créé depuis region_id")
+        else:
+            gdf.attrs['synthetic_ids'] = False
+            
+            # Si region_id existe mais pas region_name
+            if 'region_name' not in gdf.columns:
+                gdf['region_name'] = gdf['region_id']
+                print("region_name créé depuis region_id")
         
         # Vérifier geometry
         if gdf.geometry.isnull().any():
@@ -41,6 +58,11 @@ def load_regions_geojson(filepath='data/mauritius_regions.geojson'):
         
         print(f"{len(gdf)} régions prêtes")
         
+        try:
+            gdf.to_parquet(cache_path, index=False)
+        except Exception as e:
+            print(f"Erreur écriture cache régions: {e}")
+        
         return gdf
     
     except FileNotFoundError:
@@ -60,7 +82,12 @@ def load_resilience_data(filepath='data/resilience_scores.csv'):
 
     """
     try:
-        df = pd.read_csv(filepath, low_memory=False)
+        # Identifiants et noms en chaînes Arrow ; les scores restent en NumPy pour le calcul
+        df = pd.read_csv(
+            filepath,
+            low_memory=False,
+            dtype={'region_id': 'string[pyarrow]', 'region_name': 'string[pyarrow]'}
+        )
         
         print(f"CSV chargé: {len(df)} lignes")
         print(f"Colonnes: {df.columns.tolist()}")
@@ -77,19 +104,18 @@ def load_resilience_data(filepath='data/resilience_scores.csv'):
             df['region_name'] = df['region_id']
             print("region_name créé depuis region_id")
         
-        # Convertir en numérique
-        for col in ['exposure', 'vulnerability', 'adaptation']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+        # Convertir en numérique (bloc des 3 colonnes)
+        score_cols = ['exposure', 'vulnerability', 'adaptation']
+        df[score_cols] = df[score_cols].apply(pd.to_numeric, errors='coerce')
         
         # Supprimer NaN
         before = len(df)
-        df = df.dropna(subset=['exposure', 'vulnerability', 'adaptation'])
+        df = df.dropna(subset=score_cols)
         if len(df) < before:
             print(f"{before - len(df)} lignes avec NaN supprimées")
         
         # Clip valeurs 0-100
-        for col in ['exposure', 'vulnerability', 'adaptation']:
-            df[col] = df[col].clip(0, 100)
+        df[score_cols] = df[score_cols].clip(0, 100)
         
         print(f"{len(df)} régions valides")
         
@@ -113,21 +139,35 @@ def merge_data():
     """
     print("\nFUSION DES DONNÉES...")
     
+    # Résultat déjà fusionné, valable tant qu'il est plus récent que les deux sources
+    geojson_path = Path('data/mauritius_regions.geojson')
+    csv_path = Path('data/resilience_scores.csv')
+    cache_path = Path('data/merged_regions.parquet')
+    try:
+        if cache_path.exists() and cache_path.stat().st_mtime >= max(
+            geojson_path.stat().st_mtime, csv_path.stat().st_mtime
+        ):
+            merged_gdf = gpd.read_parquet(cache_path)
+            print(f"FUSION TERMINÉE (cache): {len(merged_gdf)} régions")
+            return merged_gdf
+    except Exception as e:
+        print(f"Erreur lecture cache fusion: {e}")
+    
     # 1. Charger géométrie
-    regions_gdf = load_regions_geojson('data/mauritius_regions.geojson')
+    regions_gdf = load_regions_geojson(str(geojson_path))
     if len(regions_gdf) == 0:
         print("Impossible de continuer sans régions")
         return gpd.GeoDataFrame()
     
     # 2. Charger données résilience
-    resilience_df = load_resilience_data('data/resilience_scores.csv')
+    resilience_df = load_resilience_data(str(csv_path))
     if len(resilience_df) == 0:
         print("Impossible de continuer sans données résilience")
         return gpd.GeoDataFrame()
     
     
-    # Vérifier si GeoJSON a des IDs temporaires
-    if regions_gdf['region_id'].iloc[0].startswith('TEMP_'):
+    # Vérifier si GeoJSON a des IDs temporaires (marqué au chargement)
+    if regions_gdf.attrs.get('synthetic_ids', False):
         print("\nGeoJSON sans IDs réels détecté")
         print("MERGE PAR ORDRE (index)")
         
@@ -142,25 +182,22 @@ def merge_data():
             resilience_df = resilience_df.head(n)
         
         # MERGE PAR INDEX
-        # Réinitialiser les index
-        regions_gdf = regions_gdf.reset_index(drop=True)
-        resilience_df = resilience_df.reset_index(drop=True)
-        
-        # Copier les vraies données du CSV dans le GeoDataFrame
-        regions_gdf['region_id'] = resilience_df['region_id'].values
-        regions_gdf['region_name'] = resilience_df['region_name'].values
-        regions_gdf['exposure'] = resilience_df['exposure'].values
-        regions_gdf['vulnerability'] = resilience_df['vulnerability'].values
-        regions_gdf['adaptation'] = resilience_df['adaptation'].values
-        
-        # Ajouter population si présente
+        # Colonnes du CSV copiées dans le GeoDataFrame, en une seule concaténation
+        data_cols = ['region_id', 'region_name', 'exposure', 'vulnerability', 'adaptation']
         if 'population' in resilience_df.columns:
-            regions_gdf['population'] = resilience_df['population'].values
-        else:
-            # Population par défaut
-            regions_gdf['population'] = 50000
+            data_cols.append('population')
+        
+        left = regions_gdf.drop(columns=[c for c in data_cols if c in regions_gdf.columns])
+        right = resilience_df[data_cols]
+        merged_gdf = gpd.GeoDataFrame(
+            pd.concat([left.reset_index(drop=True), right.reset_index(drop=True)], axis=1),
+            geometry='geometry',
+            crs=regions_gdf.crs
+        )
         
-        merged_gdf = regions_gdf
+        # Population par défaut si absente du CSV
+        if 'population' not in merged_gdf.columns:
+            merged_gdf['population'] = 50000
         
         print(f"{len(merged_gdf)} régions fusionnées par INDEX")
     
@@ -168,9 +205,9 @@ def merge_data():
         # MERGE NORMAL par region_id
         print("\nMERGE NORMAL par region_id")
         
-        # Normaliser IDs
-        regions_gdf['region_id'] = regions_gdf['region_id'].astype(str).str.strip().str.upper()
-        resilience_df['region_id'] = resilience_df['region_id'].astype(str).str.strip().str.upper()
+        # Normaliser IDs (chaînes Arrow : strip/upper en noyaux vectorisés)
+        regions_gdf['region_id'] = regions_gdf['region_id'].astype('string[pyarrow]').str.strip().str.upper()
+        resilience_df['region_id'] = resilience_df['region_id'].astype('string[pyarrow]').str.strip().str.upper()
         
         # Merge
         merged_gdf = regions_gdf.merge(
@@ -200,6 +237,12 @@ def merge_data():
         if lost_data > 0:
             print(f"{lost_data} données sans géométrie (ignorées)")
     
+    # Types compacts : scores entiers 0-100 → int8, population → int32
+    # (sans perte ; les colonnes avec décimales restent en float64)
+    for col in ['exposure', 'vulnerability', 'adaptation', 'population']:
+        if col in merged_gdf.columns:
+            merged_gdf[col] = pd.to_numeric(merged_gdf[col], downcast='integer')
+    
     # Vérification finale
     print(f"\nFUSION TERMINÉE: {len(merged_gdf)} régions")
     print(f"Colonnes: {merged_gdf.columns.tolist()}")
@@ -212,6 +255,10 @@ def merge_data():
         print(f"ERREUR: Colonnes manquantes: {missing}")
     else:
         print(f"Toutes les colonnes requises présentes")
+        try:
+            merged_gdf.to_parquet(cache_path, index=False)
+        except Exception as e:
+            print(f"Erreur écriture cache fusion: {e}")
     
     return merged_gdf
 
@@ -1,5 +1,7 @@
 import folium
 import geopandas as gpd
+import numpy as np
+import pandas as pd
 from utils.config import (
     MAURITIUS_CENTER,
     MAURITIUS_ZOOM_START,
@@ -20,22 +22,34 @@ def create_base_map():
     return base_map
 
 
+# Couleur par catégorie (jaune par défaut)
+_COLOR_TABLE = {k: COLOR_SCHEME[k] for k in ('critical', 'low', 'medium', 'high')}
+_DEFAULT_COLOR = COLOR_SCHEME['medium']
+
+
 def get_color_for_category(category):
     """
     Retourne couleur HEX selon catégorie (4 niveaux)
     """
-    category = str(category).lower().strip()
-    
-    if category == 'critical':
-        return COLOR_SCHEME['critical']  # Rouge
-    elif category == 'low':
-        return COLOR_SCHEME['low']       # Orange
-    elif category == 'medium':
-        return COLOR_SCHEME['medium']    # Jaune
-    elif category == 'high':
-        return COLOR_SCHEME['high']      # Vert
-    else:
-        return COLOR_SCHEME['medium']    # Défaut: jaune
+    color = _COLOR_TABLE.get(category) if isinstance(category, str) else None
+    if color is None:
+        color = _COLOR_TABLE.get(str(category).lower().strip(), _DEFAULT_COLOR)
+    return color
+
+
+# Styles des régions (seule la couleur de remplissage varie, lue dans _fill_color)
+_REGION_STYLE = {'color': 'black', 'weight': 1.5, 'fillOpacity': 0.45, 'opacity': 1}
+_REGION_HIGHLIGHT = {'color': '#ffffff', 'weight': 3, 'fillOpacity': 0.7, 'opacity': 1}
+
+
+def _resilience_style(feature):
+    """Style d'une région selon sa couleur précalculée"""
+    return {'fillColor': feature['properties'].get('_fill_color', _DEFAULT_COLOR), **_REGION_STYLE}
+
+
+def _resilience_highlight(feature):
+    """Style d'une région survolée"""
+    return {'fillColor': feature['properties'].get('_fill_color', _DEFAULT_COLOR), **_REGION_HIGHLIGHT}
 
 
 def add_resilience_layer(map_obj, gdf):
@@ -52,42 +66,21 @@ def add_resilience_layer(map_obj, gdf):
     if missing:
         raise ValueError(f"DEV 3: Colonnes manquantes: {missing}")
     
-    # Debug couleurs
-    print("\nCOULEURS PAR RÉGION:")
-    for _, row in gdf.iterrows():
-        cat = row['category']
-        color = get_color_for_category(cat)
-        print(f"  {row['region_name']:25s} → {cat:8s} → {color}")
-    
-    # Convertir en GeoJSON
-    geojson_data = gdf.__geo_interface__
-    
-    # Style fonction
-    def style_function(feature):
-        props = feature['properties']
-        category = props.get('category', 'medium')
-        color = get_color_for_category(category)
-        
-        return {
-            'fillColor': color,
-            'color': 'black',
-            'weight': 1.5,
-            'fillOpacity': 0.45,    
-            'opacity': 1
-        }
-    
-    def highlight_function(feature):
-        props = feature['properties']
-        category = props.get('category', 'medium')
-        color = get_color_for_category(category)
-        
-        return {
-            'fillColor': color,
-            'color': '#ffffff',
-            'weight': 3,
-            'fillOpacity': 0.7,     
-            'opacity': 1
-        }
+    # Couleurs calculées une fois par région, lues telles quelles par le style
+    category = gdf['category']
+    if isinstance(category.dtype, pd.CategoricalDtype):
+        # Une couleur par catégorie, indexée par les codes (-1 = NaN → dernière, défaut)
+        palette = np.array(
+            [get_color_for_category(c) for c in category.cat.categories] + [_DEFAULT_COLOR],
+            dtype=object
+        )
+        fill_colors = palette[category.cat.codes.to_numpy()]
+    else:
+        fill_colors = category.astype(str).map(get_color_for_category).to_numpy()
+    gdf = gdf.assign(_fill_color=fill_colors)
+    
+    # Debug couleurs : un résumé par catégorie plutôt qu'une ligne par région
+    print(f"DEV 3: Régions par catégorie: {gdf['category'].value_counts(sort=False).to_dict()}")
     
     # Tooltip fields
     tooltip_fields = ['region_name', 'resilience_index', 'category']
@@ -97,12 +90,15 @@ def add_resilience_layer(map_obj, gdf):
         tooltip_fields.extend(['exposure', 'vulnerability', 'adaptation'])
         tooltip_aliases.extend(['Exposition:', 'Vulnérabilité:', 'Adaptation:'])
     
+    # Convertir en GeoJSON (chaîne), seulement les colonnes utilisées par le style et le tooltip
+    geojson_data = gdf[tooltip_fields + ['_fill_color', 'geometry']].to_json()
+    
     # Ajouter la couche GeoJson
     folium.GeoJson(
         geojson_data,
         name='Résilience Climatique',
-        style_function=style_function,
-        highlight_function=highlight_function,
+        style_function=_resilience_style,
+        highlight_function=_resilience_highlight,
         tooltip=folium.GeoJsonTooltip(
             fields=tooltip_fields,
             aliases=tooltip_aliases,
@@ -136,18 +132,27 @@ def add_hazard_layer(map_obj, hazard_gdf):
         'fire_station': {'icon': 'fire-extinguisher', 'color': 'orange'}
     }
     
-    for idx, row in hazard_gdf.iterrows():
-        hazard_type = row.get('hazard_type', 'unknown')
+    # Colonnes extraites une fois, sans construire une Series par ligne
+    n = len(hazard_gdf)
+    has_severity = 'severity' in hazard_gdf.columns
+    has_capacity = 'capacity' in hazard_gdf.columns
+    xs = hazard_gdf.geometry.x.to_numpy()
+    ys = hazard_gdf.geometry.y.to_numpy()
+    types = hazard_gdf['hazard_type'].to_numpy() if 'hazard_type' in hazard_gdf.columns else ['unknown'] * n
+    severities = hazard_gdf['severity'].to_numpy() if has_severity else [None] * n
+    capacities = hazard_gdf['capacity'].to_numpy() if has_capacity else [None] * n
+    
+    for x, y, hazard_type, severity, capacity in zip(xs, ys, types, severities, capacities):
         icon_config = icon_map.get(hazard_type, {'icon': 'info-sign', 'color': 'gray'})
         
         popup_text = f"<b>{hazard_type.replace('_', ' ').title()}</b><br>"
-        if 'severity' in row:
-            popup_text += f"Sévérité: {row['severity']}<br>"
-        if 'capacity' in row:
-            popup_text += f"Capacité: {row['capacity']} personnes"
+        if has_severity:
+            popup_text += f"Sévérité: {severity}<br>"
+        if has_capacity:
+            popup_text += f"Capacité: {capacity} personnes"
         
         folium.Marker(
-            location=[row.geometry.y, row.geometry.x],
+            location=[y, x],
             popup=folium.Popup(popup_text, max_width=200),
             icon=folium.Icon(
                 icon=icon_config['icon'],
@@ -1,18 +1,27 @@
-import pandas as pd
+from bisect import bisect_right
 import numpy as np
 from utils.config import (
-    RESILIENCE_WEIGHTS,
-    RESILIENCE_THRESHOLDS,
+    W_EXPOSURE,
+    W_VULNERABILITY,
+    W_ADAPTATION,
+    RESILIENCE_BOUNDS,
+    RESILIENCE_LABELS,
     CYCLONE_IMPACT_FACTOR
 )
 
+# Catégories ordonnées du plus grave au plus sûr (codes 0..3)
+RESILIENCE_CATEGORIES = list(RESILIENCE_LABELS)
+
+# Bornes basses des catégories au-dessus de 'critical' : [30, 50, 70]
+_CATEGORY_EDGES = np.array(RESILIENCE_BOUNDS, dtype=np.float64)
+
 
 def calculate_resilience(exposure, vulnerability, adaptation):
     """Calcule l'indice de résilience pour UNE région."""
     composite_risk = (
-        RESILIENCE_WEIGHTS['exposure'] * exposure +
-        RESILIENCE_WEIGHTS['vulnerability'] * vulnerability -
-        RESILIENCE_WEIGHTS['adaptation'] * adaptation
+        W_EXPOSURE * exposure +
+        W_VULNERABILITY * vulnerability -
+        W_ADAPTATION * adaptation
     )
     
     resilience_index = 100 - composite_risk
@@ -21,26 +30,41 @@ def calculate_resilience(exposure, vulnerability, adaptation):
     return round(resilience_index, 2)
 
 
+def _resilience_kernel(exposure, vulnerability, adaptation):
+    """Indice de résilience (0-100, 2 décimales) pour des tableaux NumPy."""
+    # Un tableau de sortie + un tampon réutilisé (même ordre d'opérations que la formule)
+    out = np.multiply(exposure, W_EXPOSURE, dtype=np.float64)
+    term = np.multiply(vulnerability, W_VULNERABILITY, dtype=np.float64)
+    out += term
+    np.multiply(adaptation, W_ADAPTATION, out=term)
+    out -= term
+    np.subtract(100, out, out=out)
+    np.clip(out, 0, 100, out=out)
+    return np.round(out, 2, out=out)
+
+
+# Colonnes d'entrée du calcul de résilience
+_RESILIENCE_INPUTS = frozenset(['exposure', 'vulnerability', 'adaptation'])
+
+
 def calculate_resilience_batch(df):
     """Calcule résilience pour TOUTES les régions."""
-    required = ['exposure', 'vulnerability', 'adaptation']
-    missing = [col for col in required if col not in df.columns]
+    missing = sorted(_RESILIENCE_INPUTS.difference(df.columns))
     
     if missing:
         raise ValueError(f"DEV 2: Colonnes manquantes: {missing}")
     
-    # Calcul vectorisé
-    composite_risk = (
-        RESILIENCE_WEIGHTS['exposure'] * df['exposure'] +
-        RESILIENCE_WEIGHTS['vulnerability'] * df['vulnerability'] -
-        RESILIENCE_WEIGHTS['adaptation'] * df['adaptation']
+    # Calcul vectorisé sur les tableaux NumPy (sans alignement d'index pandas).
+    # Les colonnes sont lues dans leur type compact (int8 après merge_data) :
+    # la conversion en float64 se fait dans le noyau, sans copie intermédiaire.
+    df['resilience_index'] = _resilience_kernel(
+        df['exposure'].to_numpy(),
+        df['vulnerability'].to_numpy(),
+        df['adaptation'].to_numpy()
     )
     
-    df['resilience_index'] = 100 - composite_risk
-    df['resilience_index'] = df['resilience_index'].clip(0, 100).round(2)
-    
     # Ajouter catégorie (4 niveaux)
-    df['category'] = df['resilience_index'].apply(get_resilience_category)
+    df['category'] = categorize_batch(df['resilience_index'].to_numpy())
     
     print(f"DEV 2: Résilience calculée pour {len(df)} régions")
     
@@ -52,68 +76,123 @@ def get_resilience_category(score):
     Catégorise le score en 4 niveaux
     
     """
-    if score < 30:
-        return 'critical'    # Rouge
-    elif score < 50:
-        return 'low'         # Orange
-    elif score < 70:
-        return 'medium'      # Jaune
-    else:
-        return 'high'        # Vert
+    return RESILIENCE_LABELS[bisect_right(RESILIENCE_BOUNDS, score)]
 
 
-def simulate_cyclone_impact(df, cyclone_severity):
-    """Simule l'impact d'un cyclone."""
-    if not 0 <= cyclone_severity <= 100:
+def categorize_batch(scores):
+    """
+    Catégorise un tableau de scores en une seule recherche binaire (Categorical ordonné)
+    
+    """
+    import pandas as pd  # import différé : inutile pour les fonctions scalaires
+    
+    codes = np.searchsorted(_CATEGORY_EDGES, scores, side='right')
+    return pd.Categorical.from_codes(codes, categories=RESILIENCE_CATEGORIES, ordered=True)
+
+
+def _simulate_cyclone_arrays(df, severities):
+    """Exposition et résilience simulées : une ligne par intensité, une colonne par région"""
+    severities = np.asarray(severities, dtype=np.float64)
+    if not ((severities >= 0) & (severities <= 100)).all():
         raise ValueError("Severity doit être entre 0-100")
     
-    df_simulated = df.copy()
+    # Calculer impact (un seul tableau intensités × régions, modifié sur place)
+    impact = severities[:, None] * CYCLONE_IMPACT_FACTOR
+    exposure = np.add(df['exposure'].to_numpy()[None, :], impact, dtype=np.float64)
+    np.clip(exposure, 0, 100, out=exposure)
     
-    # Calculer impact
-    impact = cyclone_severity * CYCLONE_IMPACT_FACTOR
-    df_simulated['exposure'] = df_simulated['exposure'] + impact
-    df_simulated['exposure'] = df_simulated['exposure'].clip(0, 100)
+    # Recalculer résilience directement sur le tableau d'exposition simulé
+    resilience = _resilience_kernel(
+        exposure,
+        df['vulnerability'].to_numpy(),
+        df['adaptation'].to_numpy()
+    )
+    return exposure, resilience
+
+
+def simulate_cyclone_impact(df, cyclone_severity):
+    """Simule l'impact d'un cyclone."""
+    exposure, resilience = _simulate_cyclone_arrays(df, [cyclone_severity])
     
-    # Recalculer résilience
-    df_simulated = calculate_resilience_batch(df_simulated)
+    # Nouveau DataFrame : les colonnes recalculées sont remplacées, le df d'entrée reste intact
+    df_simulated = df.assign(
+        exposure=exposure[0],
+        resilience_index=resilience[0],
+        category=categorize_batch(resilience[0])
+    )
     
     print(f"DEV 2: Cyclone severity={cyclone_severity} simulé")
     
     return df_simulated
 
 
+def simulate_cyclone_scenarios(df, severities):
+    """
+    Simule toutes les intensités d'un coup (table précalculée pour le slider)
+    
+    """
+    severities = list(severities)
+    exposure, resilience = _simulate_cyclone_arrays(df, severities)
+    
+    scenarios = {
+        severity: df.assign(
+            exposure=exposure[i],
+            resilience_index=resilience[i],
+            category=categorize_batch(resilience[i])
+        )
+        for i, severity in enumerate(severities)
+    }
+    
+    print(f"DEV 2: {len(severities)} intensités de cyclone simulées")
+    
+    return scenarios
+
+
+# Noms des cyclones par tranche d'intensité (bornes basses 20/40/60/80)
+_CYCLONE_EDGES = (20, 40, 60, 80)
+_CYCLONE_NAMES = (
+    "Dépression tropicale",
+    "Tempête tropicale",
+    "Cyclone catégorie 1-2",
+    "Cyclone catégorie 3-4",
+    "Cyclone catégorie 5 (EXTRÊME)"
+)
+
+
 def get_cyclone_category(severity):
     """Nom du cyclone selon intensité."""
     if severity == 0:
         return "Pas de cyclone"
-    elif severity < 20:
-        return "Dépression tropicale"
-    elif severity < 40:
-        return "Tempête tropicale"
-    elif severity < 60:
-        return "Cyclone catégorie 1-2"
-    elif severity < 80:
-        return "Cyclone catégorie 3-4"
-    else:
-        return "Cyclone catégorie 5 (EXTRÊME)"
+    return _CYCLONE_NAMES[bisect_right(_CYCLONE_EDGES, severity)]
+
+
+# Catégories du risque combiné, du plus faible au plus fort (bornes basses de medium, high, critical)
+COMBINED_CATEGORIES = ['low', 'medium', 'high', 'critical']
+_COMBINED_EDGES = np.array([20, 40, 60], dtype=np.float64)
 
 
 def calculate_combined_resilience(df, alerts_df):
     """Calcule résilience combinée avec alertes citoyennes."""
-    merged = df.merge(alerts_df, on='region_id', how='left').fillna(0)
-    
-    merged['combined_risk'] = merged.apply(
-        lambda row: calculate_combined_risk(
-            row['resilience_index'],
-            row.get('citizen_danger_ratio', 0)
-        ),
-        axis=1
-    )
+    import pandas as pd
     
-    merged['combined_category'] = merged['combined_risk'].apply(
-        lambda x: 'critical' if x >= 60 else 
-                  'high' if x >= 40 else
-                  'medium' if x >= 20 else 'low'
+    # Alignement par index sur les régions de df (jointure gauche, régions sans alerte → 0)
+    aligned = alerts_df.set_index('region_id').reindex(df['region_id'].to_numpy()).fillna(0)
+    merged = pd.concat([df.reset_index(drop=True), aligned.reset_index(drop=True)], axis=1)
+    
+    # Combinaison linéaire vectorisée (même formule que calculate_combined_risk)
+    resilience = merged['resilience_index'].to_numpy(dtype=np.float64)
+    if 'citizen_danger_ratio' in merged.columns:
+        citizen = merged['citizen_danger_ratio'].to_numpy(dtype=np.float64)
+    else:
+        citizen = np.zeros(len(merged))
+    combined = np.round(0.6 * (100 - resilience) + 0.4 * (citizen * 100), 2)
+    merged['combined_risk'] = combined
+    
+    # Seuils 20/40/60 → low / medium / high / critical
+    codes = np.searchsorted(_COMBINED_EDGES, combined, side='right')
+    codes[np.isnan(combined)] = 0
+    merged['combined_category'] = pd.Categorical.from_codes(
+        codes, categories=COMBINED_CATEGORIES, ordered=True
     )
     
     return merged
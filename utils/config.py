@@ -5,6 +5,11 @@ RESILIENCE_WEIGHTS = {
     'adaptation': 0.20
 }
 
+# Poids figés en constantes (utilisés par les calculs, sans lookup de dict)
+W_EXPOSURE = RESILIENCE_WEIGHTS['exposure']
+W_VULNERABILITY = RESILIENCE_WEIGHTS['vulnerability']
+W_ADAPTATION = RESILIENCE_WEIGHTS['adaptation']
+
 
 # CATÉGORISATION (4 NIVEAUX)
 RESILIENCE_THRESHOLDS = {
@@ -14,6 +19,11 @@ RESILIENCE_THRESHOLDS = {
     'high': (70, 100)         # 70-100: VERT (élevé)
 }
 
+# Mêmes seuils triés pour une recherche binaire : labels du plus grave au plus sûr,
+# bornes basses de chaque catégorie après la première → (30, 50, 70)
+RESILIENCE_LABELS = tuple(sorted(RESILIENCE_THRESHOLDS, key=lambda c: RESILIENCE_THRESHOLDS[c][0]))
+RESILIENCE_BOUNDS = tuple(RESILIENCE_THRESHOLDS[c][0] for c in RESILIENCE_LABELS[1:])
+
 
 # COULEURS CARTE (4 COULEURS)
 COLOR_SCHEME = {
@@ -33,7 +43,7 @@ DATA_PATHS = {
     'mock': 'data/mock/',
     'raw': 'data/raw/',
     'processed': 'data/processed/',
-    'alerts': 'data/alerts.json'
+    'alerts': 'data/alerts.jsonl'
 }
 
 